@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from InvoiceGenerator.batch import _collect, _jobs, _render, default_filename
+from InvoiceGenerator.pdf import SimpleInvoice
+
+
+__all__ = ['render_many']
+
+
+def _submit(loop, executor, job):
+    func = functools.partial(_render, job)
+    if not isinstance(executor, ProcessPoolExecutor):
+        func = functools.partial(contextvars.copy_context().run, func)
+    return loop.run_in_executor(executor, func)
+
+
+async def render_many(invoices, out_dir, executor=None, limit=None, generator=SimpleInvoice, filename=default_filename, **gen_kwargs):
+    """
+    Generate many invoices in the executor without blocking the event loop.
+
+    Asynchronous counterpart of :func:`InvoiceGenerator.batch.render_many`, use it
+    in ``async for``. At most ``limit`` invoices are generated at the same time,
+    next invoice is taken from ``invoices`` only when one of them is finished.
+    If the iteration is cancelled or stopped, the invoices waiting in the executor
+    are cancelled; the ones already being generated are finished.
+
+    :param invoices: iterable of :class:`InvoiceGenerator.api.Invoice` objects
+        or ``(invoice, generator class)`` pairs
+    :param out_dir: directory in which the files will be written
+    :param executor: ``concurrent.futures`` executor, default executor of the loop if omitted.
+        ``ProcessPoolExecutor`` should be created with ``initializer=batch.warm_up``
+    :param limit: maximal number of invoices generated at the same time, number of CPUs by default
+    :param generator: generator class, PDF or Pohoda ``SimpleInvoice``, ``ProformaInvoice`` or ``CorrectingInvoice``
+    :param filename: function returning name of the file for ``(index, invoice, extension)``,
+        extension of the generator, e.g. ``'.pdf'`` or ``'.xml'``
+    :param gen_kwargs: passed to the ``gen`` method of the generator, e.g. ``generate_qr_code=True``
+    :returns: asynchronous iterator of :class:`InvoiceGenerator.batch.RenderResult`
+    """
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    limit = limit or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    pending = {}
+    try:
+        for job in _jobs(invoices, out_dir, generator, filename, gen_kwargs):
+            if len(pending) >= limit:
+                done, _pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield _collect(future, pending.pop(future))
+            pending[_submit(loop, executor, job)] = job
+        while pending:
+            done, _pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield _collect(future, pending.pop(future))
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,24 +1,31 @@
 # -*- coding: utf-8 -*-
 
 import collections
+import collections.abc
 import decimal
+import functools
+import itertools
+import threading
 from decimal import Decimal
 
-from InvoiceGenerator.conf import _
-
-import qrcode
+from InvoiceGenerator import conf, instrumentation
+from InvoiceGenerator.i18n import gettext as _
 
 __all__ = ['Address', 'Client', 'Provider', 'Creator', 'Item', 'Invoice']
 
 
+class _Version(object):
+    """ Counter of changes of a list of items and of the items in it. """
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+
 class UnicodeProperty(object):
+    __slots__ = ()
     _attrs = ()
 
-    def __setattr__(self, key, value):
-        if key in self._attrs:
-            value = value
-        self.__dict__[key] = value
-
 
 class Address(UnicodeProperty):
     """
@@ -44,6 +51,7 @@ class Address(UnicodeProperty):
     _attrs = ('summary', 'address', 'city', 'zip_code', 'phone', 'email',
               'bank_name', 'bank_account', 'bank_code', 'note', 'vat_id', 'ir',
               'logo_filename', 'vat_note', 'country', 'division')
+    __slots__ = _attrs
 
     def __init__(
         self, summary, address='', city='', zip_code='', phone='', email='',
@@ -103,14 +111,14 @@ class Client(Address):
     """
     Definition of client (recipient of the invoice) address.
     """
-    pass
+    __slots__ = ()
 
 
 class Provider(Address):
     """
     Definition of prvider (subject, that issued the invoice) address.
     """
-    pass
+    __slots__ = ()
 
 
 class Creator(UnicodeProperty):
@@ -121,6 +129,7 @@ class Creator(UnicodeProperty):
     :param stamp_filename: path to file with stamp (or subscription)
     """
     _attrs = ('name', 'stamp_filename')
+    __slots__ = _attrs
 
     def __init__(self, name, stamp_filename=''):
         self.name = name
@@ -136,13 +145,32 @@ class Item(object):
     :param unit: unit in which it is measured (pieces, Kg, l)
     :param tax: the tax rate under which the item falls (in percent)
     """
+    __slots__ = ('_count', '_price', '_description', '_unit', '_tax', '_versions')
 
     def __init__(self, count, price, description='', unit='', tax=Decimal(0)):
-        self.count = count
-        self.price = price
+        self._count = Decimal(count)
+        self._price = Decimal(price)
         self._description = description
-        self.unit = unit
-        self.tax = tax
+        self._unit = unit
+        self._tax = Decimal(0) if tax is None else Decimal(tax)
+        # versions of the lists of items the item was added to
+        self._versions = ()
+
+    def __getstate__(self):
+        slots = {name: getattr(self, name) for name in Item.__slots__[:-1]}
+        return getattr(self, '__dict__', None), slots
+
+    def __setstate__(self, state):
+        instance_dict, slots = state
+        if instance_dict:
+            self.__dict__.update(instance_dict)
+        for name, value in slots.items():
+            setattr(self, name, value)
+        self._versions = ()
+
+    def _changed(self):
+        for version in self._versions:
+            version.value += 1
 
     @property
     def total(self):
@@ -175,6 +203,7 @@ class Item(object):
     @count.setter
     def count(self, value):
         self._count = Decimal(value)
+        self._changed()
 
     @property
     def price(self):
@@ -184,6 +213,7 @@ class Item(object):
     @price.setter
     def price(self, value):
         self._price = Decimal(value)
+        self._changed()
 
     @property
     def unit(self):
@@ -205,6 +235,106 @@ class Item(object):
             self._tax = Decimal(0)
         else:
             self._tax = Decimal(value)
+        self._changed()
+
+
+class _ItemList(list):
+    """ List of items on the invoice, changing it or its items invalidates the cached totals. """
+
+    def __init__(self):
+        list.__init__(self)
+        self._version = _Version()
+
+    def __reduce__(self):
+        state = dict(self.__dict__)
+        del state['_version']
+        return type(self), (), state or None, iter(self)
+
+    def _own(self, items):
+        # changes of the items are counted in the version of the list
+        version = self._version
+        for item in items:
+            if isinstance(item, Item) and version not in item._versions:
+                item._versions += (version,)
+
+    def append(self, item):
+        self._version.value += 1
+        self._own((item,))
+        list.append(self, item)
+
+    def extend(self, items):
+        items = list(items)
+        self._version.value += 1
+        self._own(items)
+        list.extend(self, items)
+
+    def insert(self, index, item):
+        self._version.value += 1
+        self._own((item,))
+        list.insert(self, index, item)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = list(value)
+            self._own(value)
+        else:
+            self._own((value,))
+        self._version.value += 1
+        list.__setitem__(self, index, value)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+
+def _invalidating(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._version.value += 1
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+for _name in ('remove', 'pop', 'clear', 'sort', 'reverse', '__delitem__', '__imul__'):
+    setattr(_ItemList, _name, _invalidating(getattr(list, _name)))
+
+
+class _Totals(object):
+    """ Running totals of the items, overall and grouped by the tax rate. """
+    __slots__ = ('generation', 'total', 'total_tax', 'breakdown', '_multipliers')
+
+    def __init__(self, items=(), generation=0):
+        self.generation = generation
+        self.total = 0
+        self.total_tax = 0
+        self.breakdown = collections.OrderedDict()
+        self._multipliers = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        if type(item) is Item:
+            # same arithmetic as Item.total_tax, with the multiplier computed once per tax rate
+            total = item._price * item._count
+            tax = item._tax
+            try:
+                multiplier = self._multipliers[tax]
+            except KeyError:
+                multiplier = self._multipliers[tax] = Decimal(1) + tax / Decimal(100)
+            total_tax = total * multiplier
+        else:
+            total = item.total
+            total_tax = item.total_tax
+            tax = item.tax
+        self.total += total
+        self.total_tax += total_tax
+        row = self.breakdown.get(tax)
+        if row is None:
+            self.breakdown[tax] = {'total': total, 'total_tax': total_tax, 'tax': total_tax - total}
+        else:
+            row['total'] += total
+            row['total_tax'] += total_tax
+            row['tax'] += total_tax - total
 
 
 class Invoice(UnicodeProperty):
@@ -239,9 +369,13 @@ class Invoice(UnicodeProperty):
     #:  taxable date
     taxable_date = None
     #: currency_locale: locale according to which will be the written currency representations
+    #: and other numbers (quantities, VAT rates)
     currency_locale = "cs_CZ.UTF-8"
     #: currency identifier (e.g. "$" or "Kč")
     currency = u"Kč"
+    #: language of the texts on the invoice (e.g. "en", "cs" or "pt_BR"),
+    #: ``INVOICE_LANG`` environment variable is used if not set
+    language = None
 
     use_tax = False
 
@@ -262,18 +396,31 @@ class Invoice(UnicodeProperty):
         self.client = client
         self.provider = provider
         self.creator = creator
-        self._items = []
+        self._items = _ItemList()
+        self._totals = _Totals()
 
         for attr in self._attrs:
             self.__setattr__(attr, '')
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_totals'] = None
+        return state
+
+    def _get_totals(self):
+        totals = self._totals
+        generation = self._items._version.value
+        if totals is None or totals.generation != generation:
+            totals = self._totals = _Totals(self._items, generation)
+        return totals
+
     def _price_tax_unrounded(self):
-        return sum(item.total_tax for item in self.items)
+        return self._get_totals().total_tax
 
     @property
     def price(self):
         """ Total sum price without taxes. """
-        return self._round_result(sum(item.total for item in self.items))
+        return self._round_result(self._get_totals().total)
 
     @property
     def price_tax(self):
@@ -288,11 +435,73 @@ class Invoice(UnicodeProperty):
         :type item: Item class
         """
         assert isinstance(item, Item)
-        self._items.append(item)
+        items = self._items
+        list.append(items, item)
+        items._own((item,))
+        totals = self._totals
+        if totals is not None and totals.generation == items._version.value:
+            totals.add(item)
+
+    def add_items(self, items):
+        """
+        Add many items to the invoice at once.
+
+        The rows are converted to items and added to the totals of the invoice in one pass.
+        If any of them is invalid, none of them is added.
+
+        :param items: iterable of :class:`Item` objects, tuples of :class:`Item`
+            arguments ``(count, price, description, unit, tax)`` or dicts of its keyword arguments
+        """
+        totals = self._totals
+        if totals is not None and totals.generation != self._items._version.value:
+            totals = None
+        new_items = []
+        try:
+            for row in items:
+                if type(row) is tuple:
+                    item = Item(*row)
+                elif isinstance(row, Item):
+                    item = row
+                elif isinstance(row, collections.abc.Mapping):
+                    item = Item(**row)
+                else:
+                    item = Item(*row)
+                if totals is not None:
+                    totals.add(item)
+                new_items.append(item)
+        except BaseException:  # noqa: B902 - totals include part of the rows, compute them again
+            self._totals = None
+            raise
+        list.extend(self._items, new_items)
+        self._items._own(new_items)
+
+    def add_item_columns(self, counts, prices, descriptions=None, units=None, taxes=None):
+        """
+        Add items given by columns of values, e.g. result of a database query.
+
+        :param counts: sequence of counts of the items
+        :param prices: sequence of unit prices
+        :param descriptions: sequence of descriptions, empty if omitted
+        :param units: sequence of units, empty if omitted
+        :param taxes: sequence of tax rates, zero if omitted
+        """
+        columns = [counts, prices] + [
+            itertools.repeat(default) if column is None else column
+            for column, default in ((descriptions, ''), (units, ''), (taxes, Decimal(0)))
+        ]
+        lengths = {len(column) for column in columns if not isinstance(column, itertools.repeat)}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length, got lengths %s" % sorted(lengths))
+        self.add_items(zip(*columns))
 
     @property
     def items(self):
-        """ Items on the invoice. """
+        """
+        Items on the invoice.
+
+        Totals of the invoice are maintained as the items are added,
+        any other change of the items makes them to be computed again.
+        """
         return self._items
 
     def _round_price(self, price):
@@ -305,16 +514,9 @@ class Invoice(UnicodeProperty):
         return Decimal(self._round_price(price)) - price
 
     def _get_grouped_items_by_tax(self):
-        table = collections.OrderedDict()
-        for item in self.items:
-            if item.tax not in table:
-                table[item.tax] = {'total': item.total, 'total_tax': item.total_tax, 'tax': item.count_tax()}
-            else:
-                table[item.tax]['total'] += item.total
-                table[item.tax]['total_tax'] += item.total_tax
-                table[item.tax]['tax'] += item.count_tax()
-
-        return table
+        return collections.OrderedDict(
+            (tax, dict(row)) for tax, row in self._get_totals().breakdown.items()
+        )
 
     def _round_result(self, price):
         if self.rounding_result:
@@ -343,6 +545,63 @@ class Correction(Invoice):
         super(Correction, self).__init__(client, provider, creator)
 
 
+EncodedQrCode = collections.namedtuple('EncodedQrCode', ['text', 'matrix', 'image'])
+
+
+def encode_qr_code(payment):
+    """
+    Encode QR payment code.
+
+    Results are kept in LRU cache (size set by ``conf.QR_CACHE_SIZE`` when the first
+    code is encoded or after :func:`qr_cache_clear`), so invoices with the same
+    payment data share one already encoded QR code.
+
+    :param payment: ``QRPlatbaGenerator`` keyword arguments as a sorted tuple of items
+    :returns: ``EncodedQrCode`` with SPAYD text, matrix of modules and PIL image
+    """
+    _qr_encoding.missed = False
+    encoded = _qr_cache()(payment)
+    instrumentation.count('qr_cache.misses' if _qr_encoding.missed else 'qr_cache.hits', 1)
+    return encoded
+
+
+_cached_encode_qr_code = None
+# was the code encoded by the last call of encode_qr_code in the thread?
+_qr_encoding = threading.local()
+
+
+def _qr_cache():
+    global _cached_encode_qr_code
+    if _cached_encode_qr_code is None:
+        _cached_encode_qr_code = functools.lru_cache(maxsize=conf.QR_CACHE_SIZE)(_encode_qr_code)
+    return _cached_encode_qr_code
+
+
+def _encode_qr_code(payment):
+    _qr_encoding.missed = True
+    import qrcode
+    from qrplatba import QRPlatbaGenerator
+
+    with instrumentation.phase('qr.encode'):
+        text = QRPlatbaGenerator(**dict(payment)).get_text()
+        qr = qrcode.QRCode()
+        qr.add_data(text)
+        qr.make(fit=True)
+        matrix = tuple(tuple(row) for row in qr.get_matrix())
+        return EncodedQrCode(text, matrix, qr.make_image().get_image())
+
+
+def qr_cache_info():
+    """ Hits, misses and size of the QR code cache, see :func:`functools.lru_cache`. """
+    return _qr_cache().cache_info()
+
+
+def qr_cache_clear():
+    """ Drop the encoded QR codes, new cache has size set by ``conf.QR_CACHE_SIZE``. """
+    global _cached_encode_qr_code
+    _cached_encode_qr_code = None
+
+
 class QrCodeBuilder(object):
 
     def __init__(self, invoice):
@@ -350,12 +609,10 @@ class QrCodeBuilder(object):
         :param invoice: Invoice
         """
         self.invoice = invoice
-        self.qr = self._fill(invoice)
+        self.payment = self._fill(invoice)
         self.tmp_file = None
 
     def _fill(self, invoice):
-        from qrplatba import QRPlatbaGenerator
-
         qr_kwargs = {
             'account': invoice.provider.bank_account_str(),
             'amount': invoice.use_tax and invoice.price_tax or invoice.price,
@@ -370,21 +627,40 @@ class QrCodeBuilder(object):
         except AttributeError:
             pass
 
-        qr_kwargs = {k: v for k, v in qr_kwargs.items() if v}
+        return {k: v for k, v in qr_kwargs.items() if v}
 
-        return QRPlatbaGenerator(**qr_kwargs)
+    @property
+    def qr(self):
+        """ ``QRPlatbaGenerator`` with the payment data. """
+        from qrplatba import QRPlatbaGenerator
+        return QRPlatbaGenerator(**self.payment)
+
+    @property
+    def encoded(self):
+        """ Encoded QR code, shared with other invoices with the same payment data. """
+        return encode_qr_code(tuple(sorted(self.payment.items())))
+
+    @property
+    def image(self):
+        """ QR code as in-memory PIL image. """
+        return self.encoded.image
+
+    @property
+    def matrix(self):
+        """ QR code modules (including the quiet zone) as rows of booleans, ``True`` is dark. """
+        return self.encoded.matrix
 
     @property
     def filename(self):
+        """ Path to temporary PNG file with the QR code, remove it by :meth:`destroy`. """
         from tempfile import NamedTemporaryFile
-        img = qrcode.make(self.qr.get_text())
 
         self.tmp_file = NamedTemporaryFile(
             mode='w+b',
             suffix='.png',
             delete=False,
         )
-        img.save(self.tmp_file)
+        self.image.save(self.tmp_file, format='PNG')
         self.tmp_file.close()
         return self.tmp_file.name
 
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+import collections
+import copy
+import os
+import threading
+import zlib
+
+from InvoiceGenerator import conf, instrumentation
+
+from reportlab.pdfbase import pdfdoc, pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import _digester
+
+
+__all__ = [
+    'FontSubsetCache', 'font_subset_cache', 'FlateFilter', 'FontRegistry', 'font_registry',
+    'ImageAsset', 'ImageCache', 'image_cache',
+]
+
+
+class FontSubsetCache(object):
+    """
+    Process-wide LRU cache of the TrueType font subsets embedded into the PDFs.
+
+    Reportlab makes new subset of the font file for every document. Documents using
+    the same characters in the same order (e.g. when the characters of the language are
+    assigned first, see :meth:`FontRegistry.presubset`) get the same subset,
+    so it is made only once. Streams of the subsets compressed by :class:`FlateFilter`
+    are kept too.
+
+    :param maxsize: maximal number of the kept subsets, ``conf.FONT_SUBSET_CACHE_SIZE`` if ``None``
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._subsets = collections.OrderedDict()
+        self._compressed = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def subset(self, face, subset):
+        """
+        Subset of the font file, like ``face.makeSubset(subset)``.
+
+        :param face: ``reportlab.pdfbase.ttfonts.TTFontFace``
+        :param subset: list of the unicode code points in the subset
+        """
+        key = (face.filename, face.subfontNameX, tuple(subset))
+        with self._lock:
+            content = self._subsets.get(key)
+            if content is not None:
+                self._subsets.move_to_end(key)
+                self.hits += 1
+        if content is not None:
+            instrumentation.count('font_subset_cache.hits', 1)
+            return content
+        instrumentation.count('font_subset_cache.misses', 1)
+        with instrumentation.phase('fonts.subset', font=face.name.decode('latin-1')):
+            content = face.makeSubset(subset)
+        with self._lock:
+            self.misses += 1
+            self._subsets[key] = content
+            self._compressed.setdefault(content, {})
+            maxsize = conf.FONT_SUBSET_CACHE_SIZE if self.maxsize is None else self.maxsize
+            while len(self._subsets) > maxsize:
+                evicted = self._subsets.popitem(last=False)[1]
+                # other fonts or subsets can have the same content
+                if evicted not in self._subsets.values():
+                    self._compressed.pop(evicted, None)
+        return content
+
+    def compress(self, content, level):
+        """ ``zlib.compress(content, level)``, kept for the subsets made by :meth:`subset`. """
+        compressed = self._compressed.get(content)
+        if compressed is None:
+            return zlib.compress(content, level)
+        try:
+            return compressed[level]
+        except KeyError:
+            data = compressed[level] = zlib.compress(content, level)
+            return data
+
+    def clear(self):
+        with self._lock:
+            self._subsets.clear()
+            self._compressed.clear()
+
+
+#: cache shared by the faces of ``font_registry``
+font_subset_cache = FontSubsetCache()
+
+
+class FlateFilter(object):
+    """
+    PDF stream filter compressing the streams with given zlib level,
+    set as ``defaultStreamFilters`` of the document (see ``NumberedCanvas.setCompressionLevel``).
+
+    :param level: 1 (fastest) to 9 (smallest output), -1 is zlib default (6)
+    :param subset_cache: :class:`FontSubsetCache` keeping compressed font subsets
+    """
+    pdfname = 'FlateDecode'
+
+    def __init__(self, level=-1, subset_cache=None):
+        self.level = level
+        self.subset_cache = subset_cache
+
+    def encode(self, content):
+        if isinstance(content, str):
+            content = content.encode('utf8')
+        if self.subset_cache is None:
+            return zlib.compress(content, self.level)
+        return self.subset_cache.compress(content, self.level)
+
+    def decode(self, encoded):
+        return zlib.decompress(encoded)
+
+
+class _SubsetCachingFace(object):
+    """
+    TrueType face making the subsets by :class:`FontSubsetCache`, see :class:`FontRegistry`.
+
+    Other attributes are those of the wrapped face, which isn't changed.
+    """
+
+    def __init__(self, face, subset_cache):
+        self._face = face
+        self._subset_cache = subset_cache
+
+    def __getattr__(self, name):
+        return getattr(self._face, name)
+
+    def addSubsetObjects(self, doc, fontname, subset):
+        # calls self.makeSubset for the content of the font file
+        return type(self._face).addSubsetObjects(self, doc, fontname, subset)
+
+    def makeSubset(self, subset):
+        return self._subset_cache.subset(self._face, subset)
+
+
+class FontRegistry(object):
+    """
+    Process-wide registry of TrueType faces used by the PDF generators.
+
+    Every face is parsed and registered with reportlab only once, when it is
+    used for the first time, so generating many invoices doesn't pay for
+    parsing the TTF files again. The registry can be shared between threads.
+
+    :param fonts: face name -> path to the TTF file
+    :type fonts: dict
+    :param families: family name -> (normal face, bold face)
+    :type families: dict
+    :param subset_cache: :class:`FontSubsetCache` used by the faces, ``None`` makes
+        new subsets for every document
+    """
+
+    def __init__(self, fonts=None, families=None, subset_cache=None):
+        self.fonts = {} if fonts is None else fonts
+        self.families = {} if families is None else families
+        self.subset_cache = subset_cache
+        self._faces = set()
+        self._registered = set()
+        self._lock = threading.Lock()
+
+    def add_font(self, name, path):
+        """
+        Make the face available under given name, it is loaded on first use.
+
+        :param name: name of the face used in ``setFont`` and paragraph styles
+        :param path: path to the TTF file
+        """
+        with self._lock:
+            if name in self._faces and self.fonts[name] != path:
+                raise ValueError("Font %s is already registered from %s" % (name, self.fonts[name]))
+            self.fonts[name] = path
+
+    def add_family(self, name, normal, bold=None):
+        """
+        Define font family, so the ``<b>`` markup in paragraphs works.
+
+        :param name: name of the family
+        :param normal: name of the regular face
+        :param bold: name of the bold face, regular face is used if omitted
+        """
+        with self._lock:
+            self.families[name] = (normal, bold or normal)
+            self._registered.discard(name)
+
+    def ensure(self, *names):
+        """
+        Register the faces or families with reportlab unless they already are.
+        """
+        if self._registered.issuperset(names):
+            return
+        with self._lock:
+            for name in names:
+                if name not in self._registered:
+                    self._register(name)
+
+    def preload(self):
+        """ Load all configured faces and families, e.g. in a freshly started worker. """
+        self.ensure(*(set(self.fonts) | set(self.families)))
+
+    def presubset(self, canvas, characters):
+        """
+        Assign the characters to the subsets of all loaded faces in the document in given order,
+        so documents with the same characters get the same subsets whichever characters they
+        use first. Call it before any text is drawn.
+
+        Subsets of the faces used in the document contain all the characters then.
+        """
+        doc = canvas._doc
+        for name in sorted(self._faces):
+            pdfmetrics.getFont(name).splitString(characters, doc)
+
+    def _register(self, name):
+        if name not in self.fonts and name not in self.families:
+            raise KeyError("Font %s is not configured, add it to conf.FONTS" % name)
+        if name in self.fonts:
+            self._register_face(name)
+        if name in self.families:
+            normal, bold = self.families[name]
+            self._register_face(normal)
+            self._register_face(bold)
+            pdfmetrics.registerFontFamily(name, normal=normal, bold=bold, italic=normal, boldItalic=bold)
+        self._registered.add(name)
+
+    def _register_face(self, name):
+        if name not in self._faces:
+            with instrumentation.phase('fonts.load', font=name):
+                pdfmetrics.registerFont(TTFont(name, self.fonts[name]))
+                if self.subset_cache is not None:
+                    self._cache_subsets(name)
+            self._faces.add(name)
+
+    def _cache_subsets(self, name):
+        # reportlab keeps font object registered before for the same face, e.g. by the application,
+        # so the face of the registered font is wrapped
+        font = pdfmetrics.getFont(name)
+        if not isinstance(font.face, _SubsetCachingFace):
+            font.face = _SubsetCachingFace(font.face, self.subset_cache)
+
+
+#: registry shared by all generators, configured by ``conf.FONTS`` and ``conf.FONT_FAMILIES``
+font_registry = FontRegistry(conf.FONTS, conf.FONT_FAMILIES, font_subset_cache)
+
+
+class ImageAsset(object):
+    """
+    Image (logo, stamp) decoded and encoded for PDF only once.
+
+    The encoded image stream is shared by all documents the image is drawn into.
+
+    :param path: path to the image file
+    :param mtime: modification time of the file the asset was loaded from
+    """
+
+    def __init__(self, path, mtime):
+        self.path = path
+        self.mtime = mtime
+        self.name = _digester(('%s:%s' % (path, mtime)).encode('utf-8'))
+        self._xobject = pdfdoc.PDFImageXObject(self.name, path, mask='auto')
+        #: width of the image in pixels
+        self.width = self._xobject.width
+        #: height of the image in pixels
+        self.height = self._xobject.height
+
+    def draw(self, canvas, x, y, width, height):
+        """
+        Draw the image on the canvas, like ``canvas.drawImage(path, x, y, width, height, mask='auto')``.
+        """
+        reg_name = canvas._doc.getXObjectName(self.name)
+        if reg_name not in canvas._doc.idToObject:
+            self._add_to_document(canvas, reg_name)
+
+        canvas._currentPageHasImages = 1
+        canvas.saveState()
+        canvas.translate(x, y)
+        canvas.scale(width, height)
+        canvas._code.append("/%s Do" % reg_name)
+        canvas.restoreState()
+        canvas._formsinuse.append(self.name)
+
+    def _add_to_document(self, canvas, reg_name):
+        doc = canvas._doc
+        xobject = copy.copy(self._xobject)
+        canvas._setXObjects(xobject)
+        doc.Reference(xobject, reg_name)
+        doc.addForm(self.name, xobject)
+
+        smask = getattr(xobject, '_smask', None)
+        if smask is not None:
+            del xobject._smask
+            smask_name = doc.getXObjectName(smask.name)
+            if smask_name in doc.idToObject:
+                xobject.smask = pdfdoc.PDFObjectReference(smask_name)
+            else:
+                smask = copy.copy(smask)
+                canvas._setXObjects(smask)
+                xobject.smask = doc.Reference(smask, smask_name)
+
+
+class ImageCache(object):
+    """
+    Process-wide cache of images drawn on the invoices.
+
+    Every image is loaded once and reused by all invoices until its file is modified.
+    """
+
+    def __init__(self):
+        self._assets = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """
+        Return :class:`ImageAsset` for the image file.
+
+        :param path: path to the image file
+        """
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            asset = self._assets.get(path)
+            hit = asset is not None and asset.mtime == mtime
+            if hit:
+                self.hits += 1
+            else:
+                with instrumentation.phase('images.load'):
+                    asset = self._assets[path] = ImageAsset(path, mtime)
+                self.misses += 1
+        instrumentation.count('image_cache.hits' if hit else 'image_cache.misses', 1)
+        return asset
+
+    def clear(self):
+        with self._lock:
+            self._assets.clear()
+
+
+#: cache shared by all generators
+image_cache = ImageCache()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import contextvars
+import functools
+
+from InvoiceGenerator.api import Invoice
+
+
+__all__ = ['BaseInvoice']
+
+
+class BaseInvoice(object):
+    """
+    Base class of the invoice generators.
+
+    It doesn't depend on any output format, so e.g. the Pohoda generator
+    doesn't import reportlab.
+
+    :param invoice: the invoice
+    :type invoice: Invoice
+    """
+    #: extension of the generated files, e.g. in ``batch.render_many``
+    extension = ''
+
+    def __init__(self, invoice):
+        assert isinstance(invoice, Invoice), "invoice is not instance of Invoice"
+
+        self.invoice = invoice
+
+    def gen(self, filename):
+        """
+        Generate the invoice into file
+
+        :param filename: file in which the invoice will be written,
+            path or binary file-like object with ``write`` method (e.g. ``BytesIO`` or HTTP response)
+        :type filename: string or File
+        """
+        pass
+
+    async def agen(self, filename, *args, executor=None, **kwargs):
+        """
+        Generate the invoice in the executor without blocking the event loop.
+
+        Takes the same arguments as :meth:`gen`. Awaiting task can be cancelled,
+        but generation which already started in the executor is finished anyway.
+
+        :param executor: ``concurrent.futures`` executor, default executor of the loop if omitted.
+            With ``ProcessPoolExecutor`` the invoice is generated in another process,
+            so it must be written into a file given by the path.
+        """
+        import asyncio
+        from concurrent.futures import ProcessPoolExecutor
+
+        func = functools.partial(self.gen, filename, *args, **kwargs)
+        if not isinstance(executor, ProcessPoolExecutor):
+            # language set by i18n.override() applies in the worker thread too
+            func = functools.partial(contextvars.copy_context().run, func)
+        return await asyncio.get_running_loop().run_in_executor(executor, func)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import collections
+import os
+import traceback
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from InvoiceGenerator import conf
+from InvoiceGenerator.api import Invoice
+from InvoiceGenerator.assets import font_registry
+from InvoiceGenerator.i18n import get_catalog, get_language
+from InvoiceGenerator.pdf import SimpleInvoice
+from InvoiceGenerator.styles import default_style_sheet
+
+
+__all__ = ['RenderResult', 'render_many']
+
+
+class RenderResult(collections.namedtuple('RenderResult', ['index', 'number', 'filename', 'error'])):
+    """
+    Outcome of rendering one invoice of the batch.
+
+    :param index: position of the invoice in the input
+    :param number: number of the invoice
+    :param filename: path of the generated file
+    :param error: ``None`` if the invoice was generated, otherwise text of the traceback
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """ Was the invoice generated successfully? """
+        return self.error is None
+
+
+def default_filename(index, invoice, extension='.pdf'):
+    """ Name of the file with the invoice: invoice number or position in the batch. """
+    if invoice.number:
+        return str(invoice.number).replace('/', '-') + extension
+    return '%d%s' % (index, extension)
+
+
+def warm_up(languages=None):
+    """
+    Load everything the generators need once per process: fonts and translations.
+
+    :param languages: languages to load, all available translations if omitted
+    """
+    font_registry.ensure(*default_style_sheet.fonts)
+    if languages is None:
+        languages = set(os.listdir(os.path.join(conf.PROJECT_ROOT, 'locale'))) | {get_language()}
+    for lang in languages:
+        get_catalog(lang)
+
+
+def _render(job):
+    index, invoice, generator, filename, gen_kwargs = job
+    try:
+        generator(invoice).gen(filename, **gen_kwargs)
+    except Exception:  # noqa: B902 - failure of one invoice mustn't stop the batch
+        return RenderResult(index, invoice.number, filename, traceback.format_exc())
+    return RenderResult(index, invoice.number, filename, None)
+
+
+def _unique(path, used):
+    """ Path not used by other invoice of the batch, with ``_2``, ``_3``, ... suffix if needed. """
+    base, extension = os.path.splitext(path)
+    number = 1
+    while os.path.normcase(path) in used:
+        number += 1
+        path = '%s_%d%s' % (base, number, extension)
+    used.add(os.path.normcase(path))
+    return path
+
+
+def _jobs(invoices, out_dir, generator, filename, gen_kwargs):
+    used = set()
+    for index, invoice in enumerate(invoices):
+        job_generator = generator
+        if not isinstance(invoice, Invoice):
+            invoice, job_generator = invoice
+        path = _unique(os.path.join(out_dir, filename(index, invoice, job_generator.extension)), used)
+        yield index, invoice, job_generator, path, gen_kwargs
+
+
+def _collect(future, job):
+    try:
+        return future.result()
+    except Exception:  # noqa: B902 - e.g. crashed worker or unpicklable invoice
+        return RenderResult(job[0], job[1].number, job[3], traceback.format_exc())
+
+
+def _new_pool(workers, languages):
+    return ProcessPoolExecutor(max_workers=workers, initializer=warm_up, initargs=(languages,))
+
+
+def _render_in_pool(jobs, workers, languages):
+    executor = _new_pool(workers, languages)
+    max_pending = (workers or os.cpu_count() or 1) * 4
+    pending = {}
+    lost = []
+    try:
+        for job in jobs:
+            try:
+                pending[executor.submit(_render, job)] = job
+            except BrokenProcessPool:
+                lost.append(job)
+            if len(pending) >= max_pending:
+                yield from _drain(pending, lost, FIRST_COMPLETED)
+            if lost:
+                # a worker died and all jobs of the pool are lost, go on with new pool
+                yield from _drain(pending, lost)
+                executor.shutdown()
+                yield from _render_one_by_one(lost, languages)
+                executor = _new_pool(workers, languages)
+        yield from _drain(pending, lost)
+        yield from _render_one_by_one(lost, languages)
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+
+
+def _drain(pending, lost, return_when=ALL_COMPLETED):
+    """ Results of finished jobs, jobs lost with broken pool are added to ``lost``. """
+    done, _not_done = wait(pending, return_when=return_when)
+    for future in done:
+        job = pending.pop(future)
+        if isinstance(future.exception(), BrokenProcessPool):
+            lost.append(job)
+        else:
+            yield _collect(future, job)
+
+
+def _render_one_by_one(lost, languages):
+    """
+    Render jobs lost with broken pool in a pool with one worker, one job at a time,
+    so only the job crashing the worker again is reported as failed.
+    """
+    lost.sort(key=lambda job: job[0])
+    executor = None
+    try:
+        while lost:
+            job = lost.pop(0)
+            if executor is None:
+                executor = _new_pool(1, languages)
+            future = executor.submit(_render, job)
+            wait([future])
+            if isinstance(future.exception(), BrokenProcessPool):
+                executor.shutdown()
+                executor = None
+            yield _collect(future, job)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def render_many(invoices, out_dir, workers=None, generator=SimpleInvoice, filename=default_filename, languages=None, **gen_kwargs):
+    """
+    Generate many PDF invoices in a pool of worker processes.
+
+    The workers load fonts and translations once when they start.
+    Results are yielded as the invoices are finished, so their order may differ
+    from the input. Failure of one invoice is reported in its result
+    and doesn't stop the rest of the batch. If a worker crashes, the other invoices
+    of the pool are generated again. Invoices of the batch with the same file name
+    get ``_2``, ``_3``, ... suffix.
+
+    :param invoices: iterable of :class:`InvoiceGenerator.api.Invoice` objects
+        or ``(invoice, generator class)`` pairs
+    :param out_dir: directory in which the files will be written
+    :param workers: number of worker processes, ``None`` for number of CPUs,
+        ``0`` generates the invoices in the current process
+    :param generator: PDF generator class (``SimpleInvoice``, ``ProformaInvoice`` or ``CorrectingInvoice``)
+    :param filename: function returning name of the file for ``(index, invoice, extension)``,
+        extension of the generator, e.g. ``'.pdf'``
+    :param languages: languages loaded when the worker starts, all available translations by default
+    :param gen_kwargs: passed to the ``gen`` method of the generator, e.g. ``generate_qr_code=True``
+    :returns: iterator of :class:`RenderResult`
+    """
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    jobs = _jobs(invoices, out_dir, generator, filename, gen_kwargs)
+    if workers == 0:
+        return map(_render, jobs)
+    return _render_in_pool(jobs, workers, languages)
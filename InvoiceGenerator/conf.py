@@ -1,44 +1,87 @@
 # -*- coding: utf-8 -*-
 import os
-import sys
 
 PROJECT_ROOT = os.path.dirname(os.path.abspath(os.path.join(__file__)))
 
 LANGUAGE = 'cs'
 
+#: number of encoded QR codes kept in memory, see ``api.encode_qr_code``
+QR_CACHE_SIZE = 256
+
 
 def get_gettext(lang):
-    import gettext
-    path = os.path.join(PROJECT_ROOT, 'locale')
-    t = gettext.translation(
-        'messages',
-        path,
-        languages=[lang],
-        fallback=True,
-    )
-    t.install()
-
-    if sys.version_info >= (3, 0):
-        return lambda message: t.gettext(message)
-    else:
-        return lambda message: t.ugettext(message)
-
-
-try:
-    lang = os.environ.get("INVOICE_LANG", LANGUAGE)
-    _ = get_gettext(lang)
-except IOError:
-    def _(x): x
-    print("Fix this!")
-except ImportError:
-    def _(x): x
+    from InvoiceGenerator.i18n import get_catalog
+    return get_catalog(lang).gettext
+
+
+def __getattr__(name):
+    # ``conf._`` is kept for compatibility, the catalog is loaded when it is used for the first time
+    if name == '_':
+        global _
+        try:
+            _ = get_gettext(os.environ.get("INVOICE_LANG", LANGUAGE))
+        except (IOError, ImportError):
+            def _(x):
+                return x
+        return _
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 
 FONT_PATH = os.path.join(PROJECT_ROOT, "fonts", "DejaVuSans.ttf")
 FONT_BOLD_PATH = os.path.join(PROJECT_ROOT, "fonts", "DejaVuSans-Bold.ttf")
+FONT_SERIF_PATH = os.path.join(PROJECT_ROOT, "fonts", "DejaVuSerif.ttf")
+FONT_SERIF_BOLD_PATH = os.path.join(PROJECT_ROOT, "fonts", "DejaVuSerif-Bold.ttf")
 
 if not os.path.isfile(FONT_PATH):
     FONT_PATH = "/usr/share/fonts/TTF/DejaVuSans.ttf"
     FONT_BOLD_PATH = "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf"
+    FONT_SERIF_PATH = "/usr/share/fonts/TTF/DejaVuSerif.ttf"
+    FONT_SERIF_BOLD_PATH = "/usr/share/fonts/TTF/DejaVuSerif-Bold.ttf"
 
 if not os.path.isfile(FONT_PATH):
     raise Exception("Fonts not found")
+
+#: TrueType faces available to the PDF generators (name -> path to the TTF file).
+#: Faces are loaded on first use and then shared by all invoices in the process,
+#: add your own faces here before the first invoice is generated.
+FONTS = {
+    'DejaVu': FONT_PATH,
+    'DejaVu-Bold': FONT_BOLD_PATH,
+    'DejaVuSerif': FONT_SERIF_PATH,
+    'DejaVuSerif-Bold': FONT_SERIF_BOLD_PATH,
+}
+
+#: Font families (family name -> (normal face, bold face)) used by paragraphs
+#: with ``<b>`` markup.
+FONT_FAMILIES = {
+    'DejaVu': ('DejaVu', 'DejaVu-Bold'),
+    'DejaVuSerif': ('DejaVuSerif', 'DejaVuSerif-Bold'),
+}
+
+#: Path to ``data.xsd`` of the Pohoda XML schemas (``data.xsd``, ``invoice.xsd`` and ``type.xsd``
+#: in one directory, available from Stormware), used when the Pohoda XML is validated.
+#: The schemas are not distributed with InvoiceGenerator.
+POHODA_SCHEMA = os.environ.get("POHODA_SCHEMA")
+
+#: number of static layers of the PDF invoices (boxes, provider, header of the items) kept in memory,
+#: see ``templates.TemplateCache``
+TEMPLATE_CACHE_SIZE = 128
+
+#: number of TrueType font subsets embedded into the PDFs kept in memory, see ``assets.FontSubsetCache``
+FONT_SUBSET_CACHE_SIZE = 64
+
+#: characters assigned to the font subsets before anything is drawn when
+#: ``SimpleInvoice.presubset_fonts`` is set (language -> characters), so the invoices
+#: in the language embed the same subsets, which are made only once per process.
+#: ASCII is in the subsets always. Languages not listed here use characters of their base language.
+FONT_REPERTOIRES = {
+    'cs': u'ÁČĎÉĚÍŇÓŘŠŤÚŮÝŽáčďéěíňóřšťúůýž€„“–',
+    'en': u'€£“”‘’–',
+    'pt': u'ÀÁÂÃÇÉÊÍÓÔÕÚàáâãçéêíóôõúü€ªº“”–',
+}
+
+#: zlib level of compression of the PDF streams of pages, forms and fonts (images keep
+#: reportlab's encoding): 1 (fastest) to 9 (smallest files),
+#: -1 is zlib default (6) and 0 turns the compression off. ``None`` leaves it to reportlab
+#: (``rl_config.pageCompression``, ``rl_config.useA85``), see ``SimpleInvoice.compression_level``
+PDF_COMPRESSION_LEVEL = -1
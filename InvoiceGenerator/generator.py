@@ -2,8 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import datetime
-import os
-from tempfile import NamedTemporaryFile
+import io
 
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import mm
@@ -12,7 +11,7 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen.canvas import Canvas
 
 from .api import Invoice as ApiInvoice
-from .pdf import BaseInvoice
+from .base import BaseInvoice
 
 
 class Address:
@@ -71,16 +70,12 @@ class Invoice:
             TTFont("DejaVu", "/usr/share/fonts/truetype/ttf-dejavu/DejaVuSans.ttf")
         )
 
-        self.pdffile = NamedTemporaryFile(delete=False)
+        self.pdffile = io.BytesIO()
 
-        self.pdf = Canvas(self.pdffile.name, pagesize=letter)
+        self.pdf = Canvas(self.pdffile, pagesize=letter)
         self.pdf.setFont("DejaVu", 15)
         self.pdf.setStrokeColorRGB(0, 0, 0)
 
-    def __del__(self):
-        if os.path.isfile(self.pdffile.name):
-            os.unlink(self.pdffile.name)
-
     #############################################################
     # Setters
     #############################################################
@@ -127,13 +122,7 @@ class Invoice:
         self.pdf.showPage()
         self.pdf.save()
 
-        f = open(self.pdffile.name)
-        data = f.read()
-        f.close()
-
-        os.unlink(self.pdffile.name)
-
-        return data
+        return self.pdffile.getvalue()
 
     #############################################################
     # Draw methods
@@ -351,6 +340,6 @@ if __name__ == "__main__":
     invoice.addItem(item1)
     invoice.addItem(item2)
 
-    f = open("test.pdf", "w")
+    f = open("test.pdf", "wb")
     f.write(invoice.getContent())
     f.close()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import contextvars
+import decimal
+import functools
+import gettext as gettext_module
+import os
+import re
+import threading
+
+from InvoiceGenerator import conf, instrumentation
+
+
+__all__ = ['get_catalog', 'get_language', 'gettext', 'override', 'format_number', 'MoneyFormatter', 'money_formatter']
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+_language = contextvars.ContextVar('invoice_language', default=None)
+
+
+def get_language():
+    """
+    Language of the texts on the invoices.
+
+    Language activated by :func:`override` takes precedence, otherwise it is taken
+    from ``INVOICE_LANG`` environment variable or ``conf.LANGUAGE``.
+    """
+    return _language.get() or os.environ.get("INVOICE_LANG", conf.LANGUAGE)
+
+
+@contextlib.contextmanager
+def override(lang):
+    """
+    Use the language for the texts within the block.
+
+    The language is stored in a context variable, so threads and asyncio tasks
+    rendering invoices in different languages don't affect each other.
+
+    :param lang: language code, ``None`` keeps the current language
+    """
+    token = _language.set(lang) if lang else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            _language.reset(token)
+
+
+def get_catalog(lang):
+    """
+    Translations for the language.
+
+    The ``.mo`` file is loaded only on the first call, following calls return
+    the same catalog, so the lookup costs only a dictionary hit.
+    Unknown languages get catalog that leaves the messages untranslated.
+
+    :param lang: language code, e.g. ``cs`` or ``pt_BR``
+    """
+    try:
+        return _catalogs[lang]
+    except KeyError:
+        pass
+    with _catalogs_lock:
+        if lang not in _catalogs:
+            with instrumentation.phase('translations.load', language=lang):
+                _catalogs[lang] = gettext_module.translation(
+                    'messages',
+                    os.path.join(conf.PROJECT_ROOT, 'locale'),
+                    languages=[lang],
+                    fallback=True,
+                )
+        return _catalogs[lang]
+
+
+def gettext(message):
+    """ Translate the message into current language. """
+    return get_catalog(get_language()).gettext(message)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_locale(locale):
+    # babel is imported on first use, so importing the models stays cheap
+    from babel import Locale
+    return Locale.parse(locale)
+
+
+@functools.lru_cache(maxsize=None)
+def _number_pattern(decimal_places):
+    from babel.numbers import parse_pattern
+    pattern = '#,##0'
+    if decimal_places:
+        pattern += '.' + '0' * decimal_places
+    return parse_pattern(pattern)
+
+
+def format_number(number, locale, decimal_places=0):
+    """
+    Format number with digit grouping according to the locale.
+
+    Unlike ``locale.format_string`` this doesn't depend on the locale of the process.
+
+    :param number: the number
+    :param locale: locale identifier, e.g. ``cs_CZ.UTF-8``
+    :param decimal_places: number of digits after the decimal point
+    """
+    return _number_pattern(decimal_places).apply(number, _parse_locale(locale))
+
+
+class MoneyFormatter(object):
+    """
+    Formats amounts of money in one currency according to one locale.
+
+    Gives the same result as ``babel.numbers.format_currency``, but the locale
+    data and the currency pattern are looked up only once, when the formatter
+    is created, and the recently formatted amounts are remembered.
+    Amounts in ``cs_CZ.UTF-8`` locale are written without zero decimals, e.g. ``100,- Kč``.
+    Use :func:`money_formatter` to get shared formatter.
+
+    :param currency: currency code or symbol, e.g. ``USD`` or ``Kč``
+    :param locale: locale identifier, e.g. ``cs_CZ.UTF-8``
+    """
+    #: number of remembered amounts
+    cache_size = 4096
+    _probes = ('0', '0.005', '0.015', '-1', '999.999', '1000', '-1234567.891', '12345678901234567')
+
+    def __init__(self, currency, locale):
+        self.currency = currency
+        self.locale = locale
+        self._locale = _parse_locale(locale)
+        self._pattern = self._locale.currency_formats['standard']
+        self._whole_only = locale == 'cs_CZ.UTF-8'
+        self._cache = {}
+        self._compile()
+
+    def _compile(self):
+        from babel.numbers import get_currency_precision, get_decimal_symbol, get_group_symbol
+
+        pattern = self._pattern
+        self._fast = not (pattern.scale or pattern.exp_prec or '@' in pattern.pattern or '¤¤¤' in pattern.pattern)
+        if not self._fast:
+            return
+        digits = get_currency_precision(self.currency)
+        self._quantum = decimal.Decimal(10) ** -digits
+        self._decimal_symbol = get_decimal_symbol(self._locale) if digits else ''
+        self._group_symbol = get_group_symbol(self._locale)
+        self._grouping = pattern.grouping
+        self._min_int = pattern.int_prec[0]
+        self._prefix = tuple(self._affix(affix) for affix in pattern.prefix)
+        self._suffix = tuple(self._affix(affix) for affix in pattern.suffix)
+        # fall back to babel for patterns the fast path doesn't handle the same way
+        self._fast = all(
+            self._format(decimal.Decimal(probe)) == self._format_babel(decimal.Decimal(probe))
+            for probe in self._probes
+        )
+
+    def _affix(self, affix):
+        from babel.numbers import get_currency_symbol
+
+        affix = affix.replace('¤¤', self.currency.upper()).replace('¤', get_currency_symbol(self.currency, self._locale))
+        return re.sub(r"'([^']*)'", lambda m: m.group(1) or "'", affix)
+
+    def _format_babel(self, amount):
+        from babel.numbers import format_currency
+
+        return format_currency(amount, self.currency, locale=self._locale)
+
+    def _format(self, amount):
+        is_negative = int(amount.is_signed())
+        integer, _sep, fraction = format(abs(amount).normalize().quantize(self._quantum), 'f').partition('.')
+        if len(integer) < self._min_int:
+            integer = '0' * (self._min_int - len(integer)) + integer
+        size = self._grouping[0]
+        groups = []
+        while len(integer) > size:
+            groups.append(integer[-size:])
+            integer = integer[:-size]
+            size = self._grouping[1]
+        groups.append(integer)
+        number = self._group_symbol.join(reversed(groups))
+        if self._decimal_symbol:
+            number += self._decimal_symbol + fraction
+        return self._prefix[is_negative] + number + self._suffix[is_negative]
+
+    def format(self, amount):
+        """
+        Format the amount.
+
+        :param amount: the amount, ``Decimal``, ``int`` or ``float``
+        """
+        try:
+            return self._cache[amount]
+        except (KeyError, TypeError):
+            pass
+        value = amount if isinstance(amount, decimal.Decimal) else decimal.Decimal(str(amount))
+        if self._fast and value.is_finite():
+            text = self._format(value)
+        else:
+            text = self._format_babel(value)
+        if self._whole_only:
+            text = text.replace(u",00", u",-")
+        # zero isn't remembered, -0 and 0 are equal, but formatted differently
+        if value.is_finite() and not value.is_zero():
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[amount] = text
+        return text
+
+    __call__ = format
+
+
+@functools.lru_cache(maxsize=None)
+def money_formatter(currency, locale):
+    """
+    Shared :class:`MoneyFormatter` for the currency and locale.
+    """
+    return MoneyFormatter(currency, locale)
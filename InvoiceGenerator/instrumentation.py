@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Durations of the phases of invoice generation and counters (items, pages, bytes, cache hits).
+
+Nothing is measured until a callback is subscribed; then every measurement
+is passed to the callbacks as :data:`Metric`::
+
+    from InvoiceGenerator import instrumentation
+
+    instrumentation.subscribe(print)
+    instrumentation.subscribe(instrumentation.StatsdAdapter(statsd.StatsClient()))
+"""
+import collections
+import contextlib
+import logging
+import os
+import time
+
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    'Metric', 'subscribe', 'unsubscribe', 'subscribed', 'enabled', 'phase', 'count',
+    'CountingWriter', 'StatsdAdapter', 'OpenTelemetryAdapter',
+]
+
+#: one measurement
+#:
+#: :param name: name of the phase or counter, e.g. ``pdf.save`` or ``pdf.pages``
+#: :param value: duration in seconds or value of the counter
+#: :param unit: ``s`` for durations, ``By`` for bytes, ``1`` for other counters
+#: :param tags: dict with details, e.g. ``{'generator': 'SimpleInvoice'}``
+Metric = collections.namedtuple('Metric', ['name', 'value', 'unit', 'tags'])
+
+_callbacks = ()
+_disabled = contextlib.nullcontext()
+
+
+def subscribe(callback):
+    """
+    Pass all following measurements to the callback.
+
+    The callback is called in the thread generating the invoice, so it should be quick.
+    Its exceptions are logged and don't stop the generation.
+
+    :param callback: callable taking :data:`Metric`
+    :returns: the callback, so this can be used as decorator
+    """
+    global _callbacks
+    _callbacks += (callback,)
+    return callback
+
+
+def unsubscribe(callback):
+    """ Stop passing the measurements to the callback. """
+    global _callbacks
+    _callbacks = tuple(subscribed for subscribed in _callbacks if subscribed is not callback)
+
+
+@contextlib.contextmanager
+def subscribed(callback):
+    """ Pass the measurements to the callback within the block. """
+    subscribe(callback)
+    try:
+        yield callback
+    finally:
+        unsubscribe(callback)
+
+
+def enabled():
+    """ Is any callback subscribed? Use it to skip computing of values which would be thrown away. """
+    return bool(_callbacks)
+
+
+def _emit(metric):
+    for callback in _callbacks:
+        try:
+            callback(metric)
+        except Exception:  # noqa: B902
+            logger.exception("Instrumentation callback %r failed", callback)
+
+
+class _Phase(object):
+    __slots__ = ('name', 'tags', 'start')
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _emit(Metric(self.name, time.perf_counter() - self.start, 's', self.tags))
+
+
+def phase(name, **tags):
+    """
+    Context manager measuring duration of the block.
+
+    :param name: name of the phase
+    :param tags: details of the measurement
+    """
+    if not _callbacks:
+        return _disabled
+    return _Phase(name, tags)
+
+
+def count(name, value, unit='1', **tags):
+    """
+    Report value of the counter.
+
+    :param name: name of the counter
+    :param value: the value
+    :param unit: ``By`` for bytes, ``1`` for other counters
+    :param tags: details of the measurement
+    """
+    if _callbacks:
+        _emit(Metric(name, value, unit, tags))
+
+
+class CountingWriter(object):
+    """
+    Binary file-like object counting bytes written into another one.
+    Other attributes (``flush``, ``name``, ...) are those of the wrapped file.
+
+    :param file: the file written to, path or binary file-like object
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def write(self, data):
+        self.count += len(data)
+        return self.file.write(data)
+
+    @classmethod
+    def wrap(cls, file):
+        """ Wrap the file-like object, paths are returned as they are. """
+        if hasattr(file, 'write'):
+            return cls(file)
+        return file
+
+    @staticmethod
+    def written(file):
+        """ Number of bytes written into the file given by path or wrapped by :meth:`wrap`. """
+        if isinstance(file, CountingWriter):
+            return file.count
+        return os.path.getsize(file)
+
+
+class StatsdAdapter(object):
+    """
+    Callback sending the measurements by statsd client, e.g. ``statsd.StatsClient``.
+
+    Durations are sent as timers in milliseconds, other values as counters.
+    Plain statsd has no tags, so they are not sent.
+
+    :param client: object with ``timing(name, milliseconds)`` and ``incr(name, count)`` methods
+    :param prefix: prefix of the names of the metrics
+    """
+
+    def __init__(self, client, prefix='invoice_generator'):
+        self.client = client
+        self.prefix = prefix
+
+    def __call__(self, metric):
+        name = '%s.%s' % (self.prefix, metric.name) if self.prefix else metric.name
+        if metric.unit == 's':
+            self.client.timing(name, metric.value * 1000)
+        else:
+            self.client.incr(name, metric.value)
+
+
+class OpenTelemetryAdapter(object):
+    """
+    Callback recording the measurements by OpenTelemetry meter.
+
+    Durations are recorded into histograms, other values into counters,
+    the tags are passed as attributes. The instruments are created on first use.
+
+    :param meter: ``opentelemetry.metrics.Meter``
+    :param prefix: prefix of the names of the instruments
+    """
+
+    def __init__(self, meter, prefix='invoice_generator'):
+        self.meter = meter
+        self.prefix = prefix
+        self._instruments = {}
+
+    def _instrument(self, metric):
+        name = '%s.%s' % (self.prefix, metric.name) if self.prefix else metric.name
+        if metric.unit == 's':
+            return self.meter.create_histogram(name, unit='s').record
+        return self.meter.create_counter(name, unit=metric.unit).add
+
+    def __call__(self, metric):
+        try:
+            record = self._instruments[metric.name]
+        except KeyError:
+            record = self._instruments[metric.name] = self._instrument(metric)
+        record(metric.value, attributes=metric.tags)
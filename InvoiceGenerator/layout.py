@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import collections
+
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph
+
+
+__all__ = ['ParagraphCache', 'ItemRow', 'PageBreak', 'ItemsLayout', 'layout_items']
+
+
+#: minimal height of the item row in mm
+MIN_ROW_HEIGHT = 4.23
+
+
+class ParagraphCache(object):
+    """
+    Wrapped paragraphs of one document.
+
+    Each distinct text is parsed and wrapped only once, no matter how many
+    rows share it. The paragraphs are drawn on the canvas, so the cache must not
+    be shared between documents.
+
+    :param canvas: canvas of the document
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self._paragraphs = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, style, width, height=30 * mm):
+        """
+        Paragraph wrapped to the width and its height in points.
+
+        :param text: text of the paragraph (with reportlab markup)
+        :param style: paragraph style
+        :param width: available width in points
+        :param height: available height in points
+        """
+        key = (text, style, width, height)
+        try:
+            result = self._paragraphs[key]
+        except KeyError:
+            paragraph = Paragraph(text, style)
+            _width, paragraph_height = paragraph.wrapOn(self.canvas, width, height)
+            result = self._paragraphs[key] = (paragraph, paragraph_height)
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+
+#: row of the item table
+#:
+#: :param item: the item
+#: :param paragraph: wrapped description of the item
+#: :param top: top of the table in mm
+#: :param offset: distance of the row from the top in mm
+#: :param height: height of the description in mm
+ItemRow = collections.namedtuple('ItemRow', ['item', 'paragraph', 'top', 'offset', 'height'])
+
+#: end of the page, the table is closed at ``offset`` under ``top`` and continues on the next page
+PageBreak = collections.namedtuple('PageBreak', ['top', 'offset'])
+
+#: rows and page breaks of the item table
+#:
+#: :param entries: list of :data:`ItemRow` and :data:`PageBreak`
+#: :param top: top of the table in mm after the last row
+#: :param offset: distance under the last row from ``top`` in mm
+#: :param break_after: the page has to be broken after the last row
+ItemsLayout = collections.namedtuple('ItemsLayout', ['entries', 'top', 'offset', 'break_after'])
+
+
+def layout_items(items, paragraphs, style, width, top, offset, page_top, header_height):
+    """
+    Decide position of every item row and where the pages break, before anything is drawn.
+
+    :param items: items on the invoice
+    :param paragraphs: :class:`ParagraphCache` of the document
+    :param style: style of the description of the item
+    :param width: width of the description in points
+    :param top: top of the table on the first page in mm
+    :param offset: height of the table header on the first page in mm
+    :param page_top: top of the table on the following pages in mm
+    :param header_height: height of the table header on the following pages in mm
+    :rtype: ItemsLayout
+    """
+    entries = []
+    will_wrap = False
+    heights = {}
+    for item in items:
+        if top - offset < 30 * mm:
+            will_wrap = True
+
+        description = item.description
+        try:
+            paragraph, height = heights[description]
+        except KeyError:
+            paragraph, paragraph_height = paragraphs.get(description, style, width)
+            paragraph, height = heights[description] = (paragraph, max(float(paragraph_height)/mm, MIN_ROW_HEIGHT))
+
+        if will_wrap and top - offset - height < 8 * mm:
+            will_wrap = False
+            entries.append(PageBreak(top, offset))
+            top = page_top
+            offset = header_height
+
+        entries.append(ItemRow(item, paragraph, top, offset, height))
+        # same steps as drawing of the row, so the positions are the same to the last bit
+        offset += height
+        offset -= MIN_ROW_HEIGHT
+        offset += 5
+
+    return ItemsLayout(entries, top, offset, will_wrap)
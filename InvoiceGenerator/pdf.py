@@ -1,90 +1,121 @@
 # -*- coding: utf-8 -*-
-import errno
-import locale
-import os
+import io
 import warnings
 
-from InvoiceGenerator.api import Invoice, QrCodeBuilder
-from InvoiceGenerator.conf import FONT_BOLD_PATH, FONT_PATH
-from InvoiceGenerator.conf import LANGUAGE, get_gettext
-
-from PIL import Image
-
-from babel.dates import format_date
-from babel.numbers import format_currency
+from InvoiceGenerator import conf, instrumentation
+from InvoiceGenerator.api import QrCodeBuilder
+from InvoiceGenerator.assets import FlateFilter, font_registry, font_subset_cache, image_cache
+from InvoiceGenerator.base import BaseInvoice
+from InvoiceGenerator.i18n import format_number, get_language, gettext as _, money_formatter, override
+from InvoiceGenerator.layout import MIN_ROW_HEIGHT, PageBreak, ParagraphCache, layout_items
+from InvoiceGenerator.styles import default_style_sheet
+from InvoiceGenerator.templates import StaticLayer
 
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.platypus import Frame, KeepInFrame, Paragraph
 
 
-__all__ = ['SimpleInvoice', 'ProformaInvoice', 'CorrectingInvoice']
+__all__ = ['SimpleInvoice', 'ProformaInvoice', 'CorrectingInvoice', 'render_bytes', 'MultiInvoiceWriter', 'write_invoices']
 
 
 def get_lang():
-    return os.environ.get("INVOICE_LANG", LANGUAGE)
-
-
-def _(*args, **kwargs):
-    lang = get_lang()
-    try:
-        gettext = get_gettext(lang)
-    except ImportError:
-        def gettext(x): x
-    except OSError as e:
-        if e.errno == errno.ENOENT:
-            def gettext(x): x
-        else:
-            raise
-    return gettext(*args, **kwargs)
+    return get_language()
 
 
-class BaseInvoice(object):
+def _compression_level(level):
+    # read when the document is made, so conf can be changed after import
+    return conf.PDF_COMPRESSION_LEVEL if level is None else level
 
-    def __init__(self, invoice):
-        assert isinstance(invoice, Invoice), "invoice is not instance of Invoice"
 
-        self.invoice = invoice
-
-    def gen(self, filename):
-        """
-        Generate the invoice into file
+class NumberedCanvas(Canvas):
+    """
+    Canvas writing "Page X of Y" on every page of multi-page documents.
 
-        :param filename: file in which the invoice will be written
-        :type filename: string or File
-        """
-        pass
+    Every page refers to its own form with the page number and the forms
+    are defined when the document is saved and the number of pages is known.
+    Only the first page is held back until it is known whether there
+    are more pages, nothing is kept for the following ones.
 
+    Document with many invoices is divided into sections by :meth:`endSection`,
+    pages are numbered from 1 in every section.
+    """
+    #: face of the page numbers
+    font_name = 'DejaVu'
 
-class NumberedCanvas(Canvas):
     def __init__(self, *args, **kwargs):
+        compression_level = kwargs.pop('compression_level', None)
         Canvas.__init__(self, *args, **kwargs)
-        self._saved_page_states = []
+        self._first_page_state = None
+        self._section_start = 1
+        #: static layers of the invoices defined in the document, see ``SimpleInvoice._drawStaticLayer``
+        self.static_layers = {}
+        if compression_level is not None:
+            self.setCompressionLevel(compression_level)
+
+    def setCompressionLevel(self, level):
+        """
+        Compress all streams of the document (pages, forms, fonts) with given zlib level.
+
+        :param level: 1 (fastest) to 9 (smallest output), -1 is zlib default, 0 turns the compression off
+        """
+        self.setPageCompression(0)
+        self._doc.defaultStreamFilters = [FlateFilter(level, font_subset_cache)] if level else None
 
     def showPage(self):
-        self._saved_page_states.append(dict(self.__dict__))
-        self._startPage()
+        if self._pageNumber == self._section_start:
+            self._first_page_state = dict(self.__dict__)
+            self._startPage()
+            return
+        if self._first_page_state is not None:
+            self._show_first_page(numbered=True)
+        self.doForm(self._page_number_form(self._pageNumber))
+        Canvas.showPage(self)
+
+    def _show_first_page(self, numbered):
+        state = dict(self.__dict__)
+        self.__dict__.update(self._first_page_state)
+        if numbered:
+            self.doForm(self._page_number_form(self._section_start))
+        Canvas.showPage(self)
+        self.__dict__.update(state)
+        self._first_page_state = None
+
+    def endSection(self):
+        """
+        Finish the section (invoice), the following pages are numbered from 1 again.
+
+        :returns: number of pages of the section
+        """
+        if len(self._code):
+            self.showPage()
+        if self._first_page_state is not None:
+            self._show_first_page(numbered=False)
+        num_pages = self._pageNumber - self._section_start
+        if num_pages > 1:
+            for page_number in range(1, num_pages + 1):
+                self.beginForm(self._page_number_form(self._section_start + page_number - 1))
+                self.draw_page_number(num_pages, page_number)
+                self.endForm()
+        self._section_start = self._pageNumber
+        return num_pages
 
     def save(self):
         """add page info to each page (page x of y)"""
-        num_pages = len(self._saved_page_states)
-        for state in self._saved_page_states:
-            self.__dict__.update(state)
-            if num_pages > 1:
-                self.draw_page_number(num_pages)
-            Canvas.showPage(self)
+        self.endSection()
         Canvas.save(self)
 
-    def draw_page_number(self, page_count):
-        self.setFont("DejaVu", 7)
+    def _page_number_form(self, page_number):
+        return 'PageNumber%d' % page_number
+
+    def draw_page_number(self, page_count, page_number=None):
+        self.setFont(self.font_name, 7)
         self.drawRightString(
             200*mm,
             20*mm,
-            _("Page %(page_number)d of %(page_count)d") % {"page_number": self._pageNumber, "page_count": page_count},
+            _("Page %(page_number)d of %(page_count)d") % {"page_number": page_number or self._pageNumber, "page_count": page_count},
         )
 
 
@@ -92,24 +123,26 @@ def prepare_invoice_draw(self):
     self.TOP = 260
     self.LEFT = 20
 
-    pdfmetrics.registerFont(TTFont('DejaVu', FONT_PATH))
-    pdfmetrics.registerFont(TTFont('DejaVu-Bold', FONT_BOLD_PATH))
+    with instrumentation.phase('pdf.prepare', generator=type(self).__name__):
+        font_registry.ensure(*self.styles.fonts)
 
-    self.pdf = NumberedCanvas(self.filename, pagesize=letter)
-    self._addMetaInformation(self.pdf)
+        if isinstance(self.filename, NumberedCanvas):
+            # section of document with many invoices, see MultiInvoiceWriter
+            self.pdf = self.filename
+        else:
+            self.pdf = NumberedCanvas(self.filename, pagesize=letter, compression_level=_compression_level(self.compression_level))
+            self._addMetaInformation(self.pdf)
+        self.pdf.font_name = self.styles.font
 
-    self.pdf.setFont('DejaVu', 15)
-    self.pdf.setStrokeColorRGB(0, 0, 0)
+        self.pdf.setFont(self.styles.font, 15)
+        self.pdf.setStrokeColorRGB(0, 0, 0)
 
     if self.invoice.currency:
         warnings.warn("currency attribute is deprecated, use currency_locale instead", DeprecationWarning)
 
 
 def currency(amount, unit, locale):
-    currency_string = format_currency(amount, unit, locale=locale)
-    if locale == 'cs_CZ.UTF-8':
-        currency_string = currency_string.replace(u",00", u",-")
-    return currency_string
+    return money_formatter(unit, locale).format(amount)
 
 
 class SimpleInvoice(BaseInvoice):
@@ -119,18 +152,36 @@ class SimpleInvoice(BaseInvoice):
     :param invoice: the invoice
     :type invoice: Invoice
     """
+    extension = '.pdf'
     line_width = 62
+    #: fonts and paragraph styles, see :class:`InvoiceGenerator.styles.InvoiceStyleSheet`
+    styles = default_style_sheet
+    #: draw the QR code as vector paths instead of raster image
+    qr_code_vector = False
+    #: cache of the parts which are the same for all invoices of the provider (boxes, provider,
+    #: header of the items), see :class:`InvoiceGenerator.templates.TemplateCache`, e.g.
+    #: ``templates.default_template_cache``. Don't set it in subclasses drawing data
+    #: of the invoice in ``_drawMain``, ``_drawProvider`` or ``_drawItemsHeader``
+    template_cache = None
+    #: assign characters of the language (``conf.FONT_REPERTOIRES``) to the font subsets before
+    #: drawing, so the invoices in the language embed the same font subsets, which are made
+    #: only once per process (``assets.font_subset_cache``). The subsets are bigger by the
+    #: characters the invoice doesn't use
+    presubset_fonts = False
+    #: zlib level of compression of the PDF streams, ``conf.PDF_COMPRESSION_LEVEL`` if ``None``
+    compression_level = None
 
     def gen(self, filename, generate_qr_code=False):
         """
         Generate the invoice into file
 
-        :param filename: file in which the PDF simple invoice will be written
-        :type filename: string or File
+        :param filename: file in which the PDF simple invoice will be written, or canvas of
+            document with many invoices, see :class:`MultiInvoiceWriter`
+        :type filename: string, File or NumberedCanvas
         :param generate_qr_code: should be QR code included in the PDF?
         :type generate_qr_code: boolean
         """
-        self.filename = filename
+        self.filename = instrumentation.CountingWriter.wrap(filename) if instrumentation.enabled() else filename
         if generate_qr_code:
             qr_builder = QrCodeBuilder(self.invoice)
         else:
@@ -138,25 +189,35 @@ class SimpleInvoice(BaseInvoice):
 
         self.qr_builder = qr_builder
 
-        prepare_invoice_draw(self)
+        with override(self.invoice.language), instrumentation.phase('pdf.gen', generator=type(self).__name__):
+            prepare_invoice_draw(self)
 
-        # Texty
-        self._drawMain()
-        self._drawTitle()
-        self._drawProvider(self.TOP - 10, self.LEFT + 3)
-        self._drawClient(self.TOP - 39, self.LEFT + 91)
-        self._drawPayment(self.TOP - 47, self.LEFT + 3)
-        self._drawQR(self.TOP - 39.4, self.LEFT + 61, 75.0)
-        self._drawDates(self.TOP - 10, self.LEFT + 91)
-        self._drawItems(self.TOP - 80, self.LEFT)
+            # Texty
+            self._drawStaticLayer()
+            self._drawClient(self.TOP - 39, self.LEFT + 91)
+            self._drawPayment(self.TOP - 47, self.LEFT + 3)
+            self._drawQR(self.TOP - 39.4, self.LEFT + 61, 75.0)
+            self._drawDates(self.TOP - 10, self.LEFT + 91)
+            self._drawItems(self.TOP - 80, self.LEFT)
 
-        # self.pdf.setFillColorRGB(0, 0, 0)
+            # self.pdf.setFillColorRGB(0, 0, 0)
 
-        self.pdf.showPage()
-        self.pdf.save()
+            self._save()
         if self.qr_builder:
             self.qr_builder.destroy()
 
+    def _save(self):
+        generator = type(self).__name__
+        shared = self.pdf is self.filename
+        with instrumentation.phase('pdf.save', generator=generator):
+            self.pdf.showPage()
+            pages = self.pdf.endSection()
+            if not shared:
+                self.pdf.save()
+        instrumentation.count('pdf.pages', pages, generator=generator)
+        if instrumentation.enabled() and not shared:
+            instrumentation.count('pdf.bytes', instrumentation.CountingWriter.written(self.filename), 'By', generator=generator)
+
     #############################################################
     # Draw methods
     #############################################################
@@ -208,38 +269,107 @@ class SimpleInvoice(BaseInvoice):
         path.lineTo((self.LEFT + 176) * mm, (self.TOP - 27) * mm)
         self.pdf.drawPath(path, True, True)
 
-    def _drawAddress(self, top, left, width, height, header_string, address):
-        self.pdf.setFont('DejaVu', 8)
+    def _static_layer_key(self):
+        provider = self.invoice.provider
+        return (
+            type(self), get_language(), self._font_repertoire(), self.styles, self.invoice.use_tax,
+            self.TOP, self.LEFT, self.pdf._pagesize,
+            tuple(provider._get_address_lines()), tuple(provider._get_contact_lines()), provider.note,
+        )
+
+    def _drawStaticLayer(self):
+        """
+        Draw boxes, title and provider, define header of the item table.
+
+        The boxes, provider and header are drawn into forms recorded in :attr:`template_cache`, following invoices
+        of the same provider (and language) only replay the forms. In document with many
+        invoices the forms are defined once for all invoices of the same provider.
+        """
+        self._static_layer = None
+        if self.template_cache is None:
+            self._presubsetFonts()
+            self._drawMain()
+            # the title uses font set before, the provider sets smaller one
+            self._drawTitle()
+            self._drawProvider(self.TOP - 10, self.LEFT + 3)
+            return
+
+        key = self._static_layer_key()
+        layer = self.pdf.static_layers.get(key)
+        if layer is None:
+            layer = self.pdf.static_layers[key] = self._defineStaticLayer(key, len(self.pdf.static_layers))
+        self.pdf.doForm(layer.forms[0][0])
+        self._drawLogo(self.TOP - 10, self.LEFT + 3, self.invoice.provider)
+        self._drawTitle()
+        self._static_layer = layer
+
+    def _defineStaticLayer(self, key, number):
+        # only the first layer of the document can be replayed, see StaticLayer
+        suffix = '%d' % number if number else ''
+        if not number:
+            layer = self.template_cache.get(key)
+            if layer is not None and layer.replay(self.pdf):
+                instrumentation.count('pdf.template_cache.hits', 1)
+                return layer
+        instrumentation.count('pdf.template_cache.misses', 1)
+        self._presubsetFonts()
+        layer = StaticLayer.record(self.pdf, [
+            ('InvoiceFrame' + suffix, self._drawFrame),
+            ('ItemsHeader' + suffix, lambda: self._drawItemsHeader(self.TOP, self.LEFT)),
+        ])
+        if layer.reusable:
+            self.template_cache.put(key, layer)
+        return layer
+
+    def _font_repertoire(self):
+        if not self.presubset_fonts:
+            return None
+        language = get_language()
+        repertoires = conf.FONT_REPERTOIRES
+        return repertoires.get(language, repertoires.get(language.split('_')[0], u''))
+
+    def _presubsetFonts(self):
+        repertoire = self._font_repertoire()
+        if repertoire:
+            font_registry.presubset(self.pdf, repertoire)
+
+    def _drawFrame(self):
+        self._drawMain()
+        self._drawProvider(self.TOP - 10, self.LEFT + 3, logo=False)
+
+    def _drawAddress(self, top, left, width, height, header_string, address, logo=True):
+        self.pdf.setFont(self.styles.font, 8)
         text = self.pdf.beginText((left + 40) * mm, (top - 6) * mm)
         text.textLines(address._get_contact_lines())
         self.pdf.drawText(text)
 
         frame = Frame((left - 3) * mm, (top - 29) * mm, width*mm, height*mm)
-        header = ParagraphStyle('header', fontName='DejaVu', fontSize=12, leading=15)
-        default = ParagraphStyle('default', fontName='DejaVu', fontSize=8, leading=8.5)
-        small = ParagraphStyle('small', parent=default, fontSize=6, leading=6)
         story = [
-            Paragraph(header_string, header),
-            Paragraph("<br/>".join(address._get_address_lines()), default),
-            Paragraph("<br/>".join(address.note.splitlines()), small),
+            Paragraph(header_string, self.styles.header),
+            Paragraph("<br/>".join(address._get_address_lines()), self.styles.address),
+            Paragraph("<br/>".join(address.note.splitlines()), self.styles.note),
         ]
         story_inframe = KeepInFrame(width*mm, height*mm, story)
         frame.addFromList([story_inframe], self.pdf)
 
+        if logo:
+            self._drawLogo(top, left, address)
+
+    def _drawLogo(self, top, left, address):
         if address.logo_filename:
-            im = Image.open(address.logo_filename)
+            logo = image_cache.get(address.logo_filename)
             height = 30.0
-            width = float(im.size[0]) / (float(im.size[1])/height)
-            self.pdf.drawImage(self.invoice.provider.logo_filename, (left + 84) * mm - width, (top - 4) * mm, width, height, mask="auto")
+            width = float(logo.width) / (float(logo.height)/height)
+            logo.draw(self.pdf, (left + 84) * mm - width, (top - 4) * mm, width, height)
 
     def _drawClient(self, TOP, LEFT):
         self._drawAddress(TOP, LEFT, 88, 41, _(u'Customer'), self.invoice.client)
 
-    def _drawProvider(self, TOP, LEFT):
-        self._drawAddress(TOP, LEFT, 88, 36, _(u'Provider'), self.invoice.provider)
+    def _drawProvider(self, TOP, LEFT, logo=True):
+        self._drawAddress(TOP, LEFT, 88, 36, _(u'Provider'), self.invoice.provider, logo)
 
     def _drawPayment(self, TOP, LEFT):
-        self.pdf.setFont('DejaVu-Bold', 8)
+        self.pdf.setFont(self.styles.bold_font, 8)
         self.pdf.drawString(LEFT * mm, (TOP + 2) * mm, _(u'Payment information'))
 
         text = self.pdf.beginText((LEFT) * mm, (TOP - 2) * mm)
@@ -266,13 +396,23 @@ class SimpleInvoice(BaseInvoice):
         text.textLines(lines)
         self.pdf.drawText(text)
 
+    def _stampItemsHeader(self, TOP, LEFT):
+        """ Draw header of the item table from the form defined by :meth:`_drawStaticLayer`. """
+        if self._static_layer is None:
+            return self._drawItemsHeader(TOP, LEFT)
+        self.pdf.saveState()
+        self.pdf.translate((LEFT - self.LEFT) * mm, (TOP - self.TOP) * mm)
+        self.pdf.doForm(self._static_layer.forms[1][0])
+        self.pdf.restoreState()
+        return self._static_layer.values[1]
+
     def _drawItemsHeader(self,  TOP,  LEFT):
         path = self.pdf.beginPath()
         path.moveTo(LEFT * mm, (TOP - 4) * mm)
         path.lineTo((LEFT + 176) * mm, (TOP - 4) * mm)
         self.pdf.drawPath(path, True, True)
 
-        self.pdf.setFont('DejaVu-Bold', 7)
+        self.pdf.setFont(self.styles.bold_font, 7)
         self.pdf.drawString((LEFT + 1) * mm, (TOP - 2) * mm, _(u'List of items'))
 
         self.pdf.drawString((LEFT + 1) * mm, (TOP - 9) * mm, _(u'Description'))
@@ -323,68 +463,49 @@ class SimpleInvoice(BaseInvoice):
 
     def _drawItems(self, TOP, LEFT):  # noqa
         # Items
-        i = self._drawItemsHeader(TOP, LEFT)
-        self.pdf.setFont('DejaVu', 7)
+        i = self._stampItemsHeader(TOP, LEFT)
+        self.pdf.setFont(self.styles.font, 7)
 
         items_are_with_tax = self.invoice.use_tax
+        number_locale = self.invoice.currency_locale
+        money = money_formatter(self.invoice.currency, self.invoice.currency_locale)
 
         # List
-        will_wrap = False
-        for item in self.invoice.items:
-            if TOP - i < 30 * mm:
-                will_wrap = True
-
-            style = ParagraphStyle('normal', fontName='DejaVu', fontSize=7)
-            p = Paragraph(item.description, style)
-            pwidth, pheight = p.wrapOn(self.pdf, 70*mm if items_are_with_tax else 90*mm, 30*mm)
-            i_add = max(float(pheight)/mm, 4.23)
-
-            if will_wrap and TOP - i - i_add < 8 * mm:
-                will_wrap = False
-                self.pdf.rect(LEFT * mm, (TOP - i) * mm, (LEFT + 156) * mm, (i + 2) * mm, stroke=True, fill=False)  # 140,142
-                self.pdf.showPage()
-
-                i = self._drawItemsHeader(self.TOP, LEFT)
-                TOP = self.TOP
-                self.pdf.setFont('DejaVu', 7)
-
-            # leading line
-            path = self.pdf.beginPath()
-            path.moveTo(LEFT * mm, (TOP - i + 3.5) * mm)
-            path.lineTo((LEFT + 176) * mm, (TOP - i + 3.5) * mm)
-            self.pdf.setLineWidth(0.1)
-            self.pdf.drawPath(path, True, True)
-            self.pdf.setLineWidth(1)
-
-            i += i_add
-            p.drawOn(self.pdf, (LEFT + 1) * mm, (TOP - i + 3) * mm)
-            i -= 4.23
-            if items_are_with_tax:
-                if float(int(item.count)) == item.count:
-                    self.pdf.drawRightString((LEFT + 85) * mm, (TOP - i) * mm, u'%s %s' % (locale.format_string("%i", item.count, grouping=True), item.unit))
-                else:
-                    self.pdf.drawRightString((LEFT + 85) * mm, (TOP - i) * mm, u'%s %s' % (locale.format_string("%.2f", item.count, grouping=True), item.unit))
-                self.pdf.drawRightString((LEFT + 110) * mm, (TOP - i) * mm, currency(item.price, self.invoice.currency, self.invoice.currency_locale))
-                self.pdf.drawRightString((LEFT + 134) * mm, (TOP - i) * mm, currency(item.total, self.invoice.currency, self.invoice.currency_locale))
-                self.pdf.drawRightString((LEFT + 144) * mm, (TOP - i) * mm, '%.0f %%' % item.tax)
-                self.pdf.drawRightString((LEFT + 173) * mm, (TOP - i) * mm, currency(item.total_tax, self.invoice.currency, self.invoice.currency_locale))
-                i += 5
-            else:
-                if float(int(item.count)) == item.count:
-                    self.pdf.drawRightString((LEFT + 118) * mm, (TOP - i) * mm, u'%s %s' % (locale.format_string("%i", item.count, grouping=True), item.unit))
-                else:
-                    self.pdf.drawRightString((LEFT + 118) * mm, (TOP - i) * mm, u'%s %s' % (locale.format_string("%.2f", item.count, grouping=True), item.unit))
-                self.pdf.drawRightString((LEFT + 148) * mm, (TOP - i) * mm, currency(item.price, self.invoice.currency, self.invoice.currency_locale))
-                self.pdf.drawRightString((LEFT + 173) * mm, (TOP - i) * mm, currency(item.total, self.invoice.currency, self.invoice.currency_locale))
-                i += 5
+        generator = type(self).__name__
+        with instrumentation.phase('pdf.draw_items', generator=generator):
+            paragraphs = ParagraphCache(self.pdf)
+            layout = layout_items(
+                self.invoice.items,
+                paragraphs,
+                self.styles.item,
+                70*mm if items_are_with_tax else 90*mm,
+                TOP,
+                i,
+                self.TOP,
+                i,
+            )
+            for entry in layout.entries:
+                if isinstance(entry, PageBreak):
+                    self.pdf.rect(LEFT * mm, (entry.top - entry.offset) * mm, (LEFT + 156) * mm, (entry.offset + 2) * mm, stroke=True, fill=False)  # 140,142
+                    self.pdf.showPage()
 
-        if will_wrap:
+                    self._stampItemsHeader(self.TOP, LEFT)
+                    self.pdf.setFont(self.styles.font, 7)
+                else:
+                    self._drawItem(entry, LEFT, items_are_with_tax, money)
+        if instrumentation.enabled():
+            instrumentation.count('pdf.items', len(self.invoice.items), generator=generator)
+            instrumentation.count('pdf.paragraph_cache.hits', paragraphs.hits, generator=generator)
+            instrumentation.count('pdf.paragraph_cache.misses', paragraphs.misses, generator=generator)
+
+        TOP, i = layout.top, layout.offset
+        if layout.break_after:
             self.pdf.rect(LEFT * mm, (TOP - i) * mm, (LEFT + 156) * mm, (i + 2) * mm, stroke=True, fill=False)  # 140,142
             self.pdf.showPage()
 
             i = 0
             TOP = self.TOP
-            self.pdf.setFont('DejaVu', 7)
+            self.pdf.setFont(self.styles.font, 7)
 
         if self.invoice.rounding_result:
             path = self.pdf.beginPath()
@@ -393,7 +514,7 @@ class SimpleInvoice(BaseInvoice):
             i += 5
             self.pdf.drawPath(path, True, True)
             self.pdf.drawString((LEFT + 1) * mm, (TOP - i) * mm, _(u'Rounding'))
-            self.pdf.drawString((LEFT + 68) * mm, (TOP - i) * mm, currency(self.invoice.difference_in_rounding, self.invoice.currency, self.invoice.currency_locale))
+            self.pdf.drawString((LEFT + 68) * mm, (TOP - i) * mm, money(self.invoice.difference_in_rounding))
             i += 3
 
         path = self.pdf.beginPath()
@@ -402,19 +523,19 @@ class SimpleInvoice(BaseInvoice):
         self.pdf.drawPath(path, True, True)
 
         if not items_are_with_tax:
-            self.pdf.setFont('DejaVu-Bold', 11)
-            self.pdf.drawString((LEFT + 100) * mm, (TOP - i - 7) * mm, '%s: %s' % (_(u'Total'), currency(self.invoice.price, self.invoice.currency, self.invoice.currency_locale)))
+            self.pdf.setFont(self.styles.bold_font, 11)
+            self.pdf.drawString((LEFT + 100) * mm, (TOP - i - 7) * mm, '%s: %s' % (_(u'Total'), money(self.invoice.price)))
         else:
-            self.pdf.setFont('DejaVu-Bold', 6)
+            self.pdf.setFont(self.styles.bold_font, 6)
             self.pdf.drawString((LEFT + 1) * mm, (TOP - i - 2) * mm, _(u'Breakdown VAT'))
             vat_list, tax_list, total_list, total_tax_list = [_(u'VAT rate')], [_(u'Tax')], [_(u'Without VAT')], [_(u'With VAT')]
             for vat, items in self.invoice.generate_breakdown_vat().items():
-                vat_list.append("%s%%" % locale.format_string('%.2f', vat))
-                tax_list.append(currency(items['tax'], self.invoice.currency, self.invoice.currency_locale))
-                total_list.append(currency(items['total'], self.invoice.currency, self.invoice.currency_locale))
-                total_tax_list.append(currency(items['total_tax'], self.invoice.currency, self.invoice.currency_locale))
+                vat_list.append("%s%%" % format_number(vat, number_locale, 2))
+                tax_list.append(money(items['tax']))
+                total_list.append(money(items['total']))
+                total_tax_list.append(money(items['total_tax']))
 
-            self.pdf.setFont('DejaVu', 6)
+            self.pdf.setFont(self.styles.font, 6)
             text = self.pdf.beginText((LEFT + 1) * mm, (TOP - i - 5) * mm)
             text.textLines(vat_list)
             self.pdf.drawText(text)
@@ -437,11 +558,11 @@ class SimpleInvoice(BaseInvoice):
                 text.textLines([self.invoice.client.vat_note])
                 self.pdf.drawText(text)
 
-            self.pdf.setFont('DejaVu-Bold', 11)
+            self.pdf.setFont(self.styles.bold_font, 11)
             self.pdf.drawString(
                 (LEFT + 100) * mm,
                 (TOP - i - 14) * mm,
-                u'%s: %s' % (_(u'Total with tax'), currency(self.invoice.price_tax, self.invoice.currency, self.invoice.currency_locale)),
+                u'%s: %s' % (_(u'Total with tax'), money(self.invoice.price_tax)),
             )
 
         if items_are_with_tax:
@@ -451,12 +572,44 @@ class SimpleInvoice(BaseInvoice):
 
         self._drawCreator(TOP - i - 20, self.LEFT + 98)
 
+    def _drawItem(self, row, LEFT, items_are_with_tax, money):
+        item = row.item
+        TOP = row.top
+        i = row.offset
+        number_locale = self.invoice.currency_locale
+
+        # leading line
+        path = self.pdf.beginPath()
+        path.moveTo(LEFT * mm, (TOP - i + 3.5) * mm)
+        path.lineTo((LEFT + 176) * mm, (TOP - i + 3.5) * mm)
+        self.pdf.setLineWidth(0.1)
+        self.pdf.drawPath(path, True, True)
+        self.pdf.setLineWidth(1)
+
+        i += row.height
+        row.paragraph.drawOn(self.pdf, (LEFT + 1) * mm, (TOP - i + 3) * mm)
+        i -= MIN_ROW_HEIGHT
+        if float(int(item.count)) == item.count:
+            count = u'%s %s' % (format_number(item.count, number_locale), item.unit)
+        else:
+            count = u'%s %s' % (format_number(item.count, number_locale, 2), item.unit)
+        if items_are_with_tax:
+            self.pdf.drawRightString((LEFT + 85) * mm, (TOP - i) * mm, count)
+            self.pdf.drawRightString((LEFT + 110) * mm, (TOP - i) * mm, money(item.price))
+            self.pdf.drawRightString((LEFT + 134) * mm, (TOP - i) * mm, money(item.total))
+            self.pdf.drawRightString((LEFT + 144) * mm, (TOP - i) * mm, '%.0f %%' % item.tax)
+            self.pdf.drawRightString((LEFT + 173) * mm, (TOP - i) * mm, money(item.total_tax))
+        else:
+            self.pdf.drawRightString((LEFT + 118) * mm, (TOP - i) * mm, count)
+            self.pdf.drawRightString((LEFT + 148) * mm, (TOP - i) * mm, money(item.price))
+            self.pdf.drawRightString((LEFT + 173) * mm, (TOP - i) * mm, money(item.total))
+
     def _drawCreator(self, TOP, LEFT):
         height = 20*mm
         if self.invoice.creator.stamp_filename:
-            im = Image.open(self.invoice.creator.stamp_filename)
-            height = float(im.size[1]) / (float(im.size[0])/200.0)
-            self.pdf.drawImage(self.invoice.creator.stamp_filename, (LEFT) * mm, (TOP - 2) * mm - height, 200, height, mask="auto")
+            stamp = image_cache.get(self.invoice.creator.stamp_filename)
+            height = float(stamp.height) / (float(stamp.width)/200.0)
+            stamp.draw(self.pdf, (LEFT) * mm, (TOP - 2) * mm - height, 200, height)
 
         path = self.pdf.beginPath()
         path.moveTo((LEFT + 8) * mm, (TOP) * mm - height)
@@ -466,20 +619,41 @@ class SimpleInvoice(BaseInvoice):
         self.pdf.drawString((LEFT + 10) * mm, (TOP - 5) * mm - height, '%s: %s' % (_(u'Creator'), self.invoice.creator.name))
 
     def _drawQR(self, TOP, LEFT, size=130.0):
-        if self.qr_builder:
-            qr_filename = self.qr_builder.filename
-            im = Image.open(qr_filename)
-            height = float(im.size[1]) / (float(im.size[0]) / size)
+        if not self.qr_builder:
+            return
+        with instrumentation.phase('pdf.draw_qr', generator=type(self).__name__):
+            if self.qr_code_vector:
+                self._drawQRVector(TOP, LEFT, size)
+                return
+            image = self.qr_builder.image
+            height = float(image.size[1]) / (float(image.size[0]) / size)
             self.pdf.drawImage(
-                qr_filename,
+                ImageReader(image),
                 LEFT * mm,
                 TOP * mm - height,
                 size,
                 height,
             )
 
+    def _drawQRVector(self, TOP, LEFT, size):
+        matrix = self.qr_builder.matrix
+        module = size / len(matrix)
+        path = self.pdf.beginPath()
+        for row_number, row in enumerate(matrix):
+            y = TOP * mm - (row_number + 1) * module
+            start = None
+            for column, dark in enumerate(row + (False,)):
+                if dark and start is None:
+                    start = column
+                elif not dark and start is not None:
+                    path.rect(LEFT * mm + start * module, y, (column - start) * module, module)
+                    start = None
+        self.pdf.drawPath(path, stroke=0, fill=1)
+
     def _drawDates(self, TOP, LEFT):
-        self.pdf.setFont('DejaVu', 10)
+        from babel.dates import format_date
+
+        self.pdf.setFont(self.styles.font, 10)
         top = TOP + 1
         items = []
         lang = get_lang()
@@ -505,26 +679,25 @@ class CorrectingInvoice(SimpleInvoice):
         """
         Generate the invoice into file
 
-        :param filename: file in which the PDF correcting invoice will be written
-        :type filename: string or File
+        :param filename: file in which the PDF correcting invoice will be written, or canvas of
+            document with many invoices, see :class:`MultiInvoiceWriter`
+        :type filename: string, File or NumberedCanvas
         """
-        self.filename = filename
-        prepare_invoice_draw(self)
+        self.filename = instrumentation.CountingWriter.wrap(filename) if instrumentation.enabled() else filename
+        with override(self.invoice.language), instrumentation.phase('pdf.gen', generator=type(self).__name__):
+            prepare_invoice_draw(self)
 
-        # Texty
-        self._drawMain()
-        self._drawTitle()
-        self._drawProvider(self.TOP - 10, self.LEFT + 3)
-        self._drawClient(self.TOP - 39, self.LEFT + 91)
-        self._drawPayment(self.TOP - 47, self.LEFT + 3)
-        self.drawCorretion(self.TOP - 73, self.LEFT)
-        self._drawDates(self.TOP - 10, self.LEFT + 91)
-        self._drawItems(self.TOP - 82, self.LEFT)
+            # Texty
+            self._drawStaticLayer()
+            self._drawClient(self.TOP - 39, self.LEFT + 91)
+            self._drawPayment(self.TOP - 47, self.LEFT + 3)
+            self.drawCorretion(self.TOP - 73, self.LEFT)
+            self._drawDates(self.TOP - 10, self.LEFT + 91)
+            self._drawItems(self.TOP - 82, self.LEFT)
 
-        # self.pdf.setFillColorRGB(0, 0, 0)
+            # self.pdf.setFillColorRGB(0, 0, 0)
 
-        self.pdf.showPage()
-        self.pdf.save()
+            self._save()
 
     def _drawTitle(self):
         # Up line
@@ -536,7 +709,7 @@ class CorrectingInvoice(SimpleInvoice):
         )
 
     def drawCorretion(self, TOP, LEFT):
-        self.pdf.setFont('DejaVu', 8)
+        self.pdf.setFont(self.styles.font, 8)
         self.pdf.drawString(LEFT * mm, TOP * mm, _(u'Correction document for invoice: %s') % self.invoice.number)
         self.pdf.drawString(LEFT * mm, (TOP - 4) * mm, _(u'Reason to correction: %s') % self.invoice.reason)
 
@@ -556,7 +729,7 @@ class ProformaInvoice(SimpleInvoice):
         )
 
     def _drawDates(self, TOP, LEFT):
-        self.pdf.setFont('DejaVu', 10)
+        self.pdf.setFont(self.styles.font, 10)
         top = TOP + 1
         items = []
         if self.invoice.date:
@@ -571,3 +744,102 @@ class ProformaInvoice(SimpleInvoice):
         for item in items:
             self.pdf.drawString(item[0], top * mm, item[1])
             top += -5
+
+
+def render_bytes(invoice, generator=SimpleInvoice, **gen_kwargs):
+    """
+    Generate the PDF invoice in memory, without touching the disk.
+
+    :param invoice: the invoice
+    :type invoice: Invoice
+    :param generator: PDF generator class (``SimpleInvoice``, ``ProformaInvoice`` or ``CorrectingInvoice``)
+    :param gen_kwargs: passed to the ``gen`` method of the generator, e.g. ``generate_qr_code=True``
+    :returns: content of the PDF file
+    :rtype: bytes
+    """
+    output = io.BytesIO()
+    generator(invoice).gen(output, **gen_kwargs)
+    return output.getvalue()
+
+
+class MultiInvoiceWriter(object):
+    """
+    Writer of many invoices into one PDF document, e.g. for printing.
+
+    Pages of every invoice are numbered from 1, fonts, images and the parts of the invoices
+    which are the same for the provider are embedded only once for the whole document.
+    The document is written into the file by :meth:`close`, the writer can be used as
+    a context manager::
+
+        with MultiInvoiceWriter("invoices.pdf") as writer:
+            for invoice in invoices:
+                writer.write(invoice, generate_qr_code=True)
+
+    Nothing is written if an exception is raised in the ``with`` block.
+
+    :param file: file in which the PDF will be written
+    :type file: string or binary File
+    :param generator: PDF generator class of the invoices, it can be changed for every invoice
+    :param title: title of the document
+    :param compression_level: zlib level of compression of the PDF streams, ``conf.PDF_COMPRESSION_LEVEL`` by default
+    """
+
+    def __init__(self, file, generator=SimpleInvoice, title=None, compression_level=None):
+        self.generator = generator
+        self.file = instrumentation.CountingWriter.wrap(file) if instrumentation.enabled() else file
+        self.canvas = NumberedCanvas(self.file, pagesize=letter, compression_level=_compression_level(compression_level))
+        if title is not None:
+            self.canvas.setTitle(title)
+        #: number of invoices written
+        self.count = 0
+
+    def write(self, invoice, generator=None, **gen_kwargs):
+        """
+        Draw the invoice on the following pages of the document.
+
+        :param invoice: the invoice
+        :type invoice: Invoice
+        :param generator: PDF generator class of the invoice, ``generator`` of the writer if omitted
+        :param gen_kwargs: passed to the ``gen`` method of the generator, e.g. ``generate_qr_code=True``
+        """
+        if self.canvas is None:
+            raise ValueError("The document is already closed")
+        (generator or self.generator)(invoice).gen(self.canvas, **gen_kwargs)
+        self.count += 1
+
+    def close(self):
+        """ Write the document into the file. """
+        if self.canvas is None:
+            return
+        with instrumentation.phase('pdf.save', generator=type(self).__name__):
+            self.canvas.save()
+        self.canvas = None
+        instrumentation.count('pdf.bundle.invoices', self.count)
+        if instrumentation.enabled():
+            instrumentation.count('pdf.bytes', instrumentation.CountingWriter.written(self.file), 'By', generator=type(self).__name__)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.canvas = None
+
+
+def write_invoices(invoices, file, generator=SimpleInvoice, **gen_kwargs):
+    """
+    Write the invoices into one PDF document, see :class:`MultiInvoiceWriter`.
+
+    :param invoices: iterable of :class:`InvoiceGenerator.api.Invoice` objects
+    :param file: file in which the PDF will be written
+    :type file: string or binary File
+    :param generator: PDF generator class of the invoices
+    :param gen_kwargs: passed to the ``gen`` method of the generator, e.g. ``generate_qr_code=True``
+    :returns: number of the invoices written
+    """
+    with MultiInvoiceWriter(file, generator) as writer:
+        for invoice in invoices:
+            writer.write(invoice, **gen_kwargs)
+    return writer.count
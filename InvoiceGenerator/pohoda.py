@@ -1,14 +1,139 @@
 # -*- coding: utf-8 -*-
+import collections
 import datetime
+import decimal
+import functools
+import io
 import logging
+import os
+import threading
+import types
 import xml.etree.cElementTree as ET
 from builtins import str
 
-from .pdf import BaseInvoice
+from . import conf, instrumentation
+from .base import BaseInvoice
 
 logger = logging.getLogger(__name__)
 
-__all__ = ['SimpleInvoice']
+__all__ = ['SimpleInvoice', 'DataPackWriter', 'write_data_pack', 'ValidationError', 'PohodaSchema', 'load_schema', 'validate']
+
+_DAT_NS = "http://www.stormware.cz/schema/version_2/data.xsd"
+_INV_NS = "http://www.stormware.cz/schema/version_2/invoice.xsd"
+_TYP_NS = "http://www.stormware.cz/schema/version_2/type.xsd"
+_PREFIXES = {
+    _DAT_NS: 'dat',
+    _INV_NS: 'inv',
+    _TYP_NS: 'typ',
+}
+
+for _uri, _prefix in _PREFIXES.items():
+    ET.register_namespace(_prefix, _uri)
+
+
+@functools.lru_cache(maxsize=None)
+def _rate_table(tax_rates):
+    """
+    Tax rates normalized to ``Decimal``, shared by all generators with the same rates.
+
+    :param tax_rates: tuple of ``(identifier, rate)`` pairs
+    :returns: ``(rates, identifiers)``, tuple of ``(identifier, Decimal rate)`` pairs
+        and read-only mapping of ``Decimal`` rate -> identifier
+    """
+    rates = tuple((ident, decimal.Decimal(str(rate))) for ident, rate in tax_rates)
+    return rates, types.MappingProxyType({rate: ident for ident, rate in rates})
+
+
+def _log_unknown_tax_rates(unknown_tax_rates):
+    if unknown_tax_rates:
+        logger.warning(
+            "Tax rates not among the tax rates accepted by Pohoda system (rate: number of items): %s",
+            ", ".join("%s: %d" % (rate, count) for rate, count in sorted(unknown_tax_rates.items())),
+        )
+
+
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+
+class ValidationError(ValueError):
+    """
+    The XML doesn't conform to the Pohoda schema.
+
+    :ivar errors: messages of the validator
+    """
+
+    def __init__(self, errors):
+        super(ValidationError, self).__init__("Invalid Pohoda XML: %s" % "; ".join(errors))
+        self.errors = errors
+
+
+class PohodaSchema(object):
+    """
+    Compiled Pohoda XML schema.
+
+    Use :func:`load_schema` to get it, it is compiled only once per process.
+    Needs `lxml <https://lxml.de/>`_.
+
+    :param path: path to ``data.xsd``
+    """
+
+    def __init__(self, path):
+        from lxml import etree
+        self._etree = etree
+        self.path = path
+        self._schema = etree.XMLSchema(etree.parse(path))
+        # the validator keeps errors of the last document, so it validates one document at a time
+        self._lock = threading.Lock()
+
+    def validate(self, document):
+        """
+        Check the XML document, raise :class:`ValidationError` if it is not valid.
+
+        :param document: the XML document
+        :type document: bytes, file name or binary File
+        """
+        if isinstance(document, bytes):
+            tree = self._etree.fromstring(document)
+        else:
+            tree = self._etree.parse(document)
+        with self._lock:
+            if self._schema.validate(tree):
+                return
+            errors = ["line %d: %s" % (error.line, error.message) for error in self._schema.error_log]
+        raise ValidationError(errors)
+
+
+def load_schema(path=None):
+    """
+    Pohoda XML schema compiled on the first call, following calls return the same schema.
+
+    :param path: path to ``data.xsd``, ``conf.POHODA_SCHEMA`` by default
+    :rtype: PohodaSchema
+    """
+    path = path or conf.POHODA_SCHEMA
+    if not path:
+        raise ValueError("Path to the Pohoda XML schema is not set, see conf.POHODA_SCHEMA")
+    path = os.path.abspath(path)
+    try:
+        return _schemas[path]
+    except KeyError:
+        pass
+    with _schemas_lock:
+        if path not in _schemas:
+            _schemas[path] = PohodaSchema(path)
+        return _schemas[path]
+
+
+def validate(document, schema=None):
+    """
+    Check the Pohoda XML document, raise :class:`ValidationError` if it is not valid.
+
+    :param document: the XML document
+    :type document: bytes, file name or binary File
+    :param schema: path to ``data.xsd``, ``conf.POHODA_SCHEMA`` by default
+    """
+    load_schema(schema).validate(document)
 
 
 class SimpleInvoice(BaseInvoice):
@@ -19,23 +144,27 @@ class SimpleInvoice(BaseInvoice):
     :type invoice: Invoice
     :param tax_rates: definition of tax rates used in Pohoda, left None for default values
     :type tax_rates: dict
+    :ivar unknown_tax_rates: rates of the items missing in ``tax_rates`` -> number of the items,
+        items with these rates are written without ``rateVAT``
     """
 
+    extension = '.xml'
     tax_rates = {
         'high': 21,
         'low': 15,
         'none': 0,
     }
-    _dat_ns = "http://www.stormware.cz/schema/version_2/data.xsd"
-    _inv_ns = "http://www.stormware.cz/schema/version_2/invoice.xsd"
-    _typ_ns = "http://www.stormware.cz/schema/version_2/type.xsd"
+    _dat_ns = _DAT_NS
+    _inv_ns = _INV_NS
+    _typ_ns = _TYP_NS
 
     def __init__(self, invoice, tax_rates=None):
         super(SimpleInvoice, self).__init__(invoice)
 
         if tax_rates:
             self.tax_rates = tax_rates
-        self.inv_tax_rates = {v: k for k, v in self.tax_rates.items()}
+        self._rates, self.inv_tax_rates = _rate_table(tuple(self.tax_rates.items()))
+        self.unknown_tax_rates = collections.Counter()
 
     def _add_item(self, xml_invoice, item):
         invoice_item = ET.SubElement(xml_invoice, "{%s}invoiceItem" % self._inv_ns)
@@ -47,10 +176,11 @@ class SimpleInvoice(BaseInvoice):
         ET.SubElement(home_currency, '{%s}unitPrice' % self._typ_ns).text = str(item.price)
 
         ET.SubElement(invoice_item, '{%s}text' % self._inv_ns).text = str(item.description)[:90]
-        if item.tax in self.inv_tax_rates:
-            ET.SubElement(invoice_item, '{%s}rateVAT' % self._inv_ns).text = self.inv_tax_rates[item.tax]
+        rate_ident = self.inv_tax_rates.get(item.tax)
+        if rate_ident is not None:
+            ET.SubElement(invoice_item, '{%s}rateVAT' % self._inv_ns).text = rate_ident
         else:
-            logger.warning("Tax rate %s is not among the tax rates accepted by Pohoda system" % item.tax)
+            self.unknown_tax_rates[item.tax] += 1
 
         return invoice_item
 
@@ -112,33 +242,17 @@ class SimpleInvoice(BaseInvoice):
         ET.SubElement(invoice_summary, "{%s}roundingDocument" % self._inv_ns).text = "math2one"
         home_currency = ET.SubElement(invoice_summary, "{%s}homeCurrency" % self._inv_ns)
         breakdown = self.invoice.generate_breakdown_vat()
-        for rate_ident, rate in self.tax_rates.items():
+        for rate_ident, rate in self._rates:
             if rate in breakdown:
                 rate_camel = rate_ident.capitalize()
                 ET.SubElement(home_currency, '{%s}price%s' % (self._typ_ns, rate_camel)).text = str(breakdown[rate]['total_tax'])
                 if rate_ident != 'none':
                     ET.SubElement(home_currency, '{%s}price%sVAT' % (self._typ_ns, rate_camel)).text = str(breakdown[rate]['tax'])
 
-    def gen(self, filename):
-        """
-        Generate the invoice into file
-
-        :param filename: file in which the XML invoice will be written
-        :type filename: string or File
-        """
-        ET.register_namespace('dat', self._dat_ns)
-        ET.register_namespace('inv', self._inv_ns)
-        ET.register_namespace('typ', self._typ_ns)
-
-        data_pack = ET.Element(
-            "{%s}dataPack" % self._dat_ns,
-            version="2.0",
-            id=self.invoice.number,
-            ico=self.invoice.provider.ir,
-            application="InvoiceGenerator",
-            note="Generated from InvoiceGenerator",
-        )
-        data_pack_item = ET.SubElement(data_pack, "{%s}dataPackItem" % self._dat_ns, version="2.0", id=self.invoice.number)
+    def _data_pack_item(self):
+        """ ``dataPackItem`` element with the invoice. """
+        self.unknown_tax_rates = collections.Counter()
+        data_pack_item = ET.Element("{%s}dataPackItem" % self._dat_ns, version="2.0", id=self.invoice.number)
         xml_invoice = ET.SubElement(data_pack_item, "{%s}invoice" % self._inv_ns, version="2.0")
 
         invoice_header = ET.SubElement(xml_invoice, "inv:invoiceHeader")
@@ -150,6 +264,206 @@ class SimpleInvoice(BaseInvoice):
 
         invoice_summary = ET.SubElement(xml_invoice, "{%s}invoiceSummary" % self._inv_ns)
         self._invoice_summary(invoice_summary)
+        return data_pack_item
+
+    def gen(self, filename, validate=False):
+        """
+        Generate the invoice into file
+
+        :param filename: file in which the XML invoice will be written
+        :type filename: string or File
+        :param validate: check the XML against the Pohoda schema (see :func:`load_schema`)
+            before it is written, :class:`ValidationError` is raised if it is not valid
+        """
+        if instrumentation.enabled():
+            filename = instrumentation.CountingWriter.wrap(filename)
+        with instrumentation.phase('pohoda.gen'):
+            data_pack = ET.Element(
+                "{%s}dataPack" % self._dat_ns,
+                version="2.0",
+                id=self.invoice.number,
+                ico=self.invoice.provider.ir,
+                application="InvoiceGenerator",
+                note="Generated from InvoiceGenerator",
+            )
+            data_pack.append(self._data_pack_item())
+            _log_unknown_tax_rates(self.unknown_tax_rates)
+
+            tree = ET.ElementTree(data_pack)
+            if validate:
+                self._write_valid(tree, filename)
+            else:
+                tree.write(filename, encoding="UTF-8", xml_declaration=True)
+        if instrumentation.enabled():
+            instrumentation.count('pohoda.items', len(self.invoice.items))
+            instrumentation.count('pohoda.bytes', instrumentation.CountingWriter.written(filename), 'By')
+
+    def _write_valid(self, tree, filename):
+        output = io.BytesIO()
+        tree.write(output, encoding="UTF-8", xml_declaration=True)
+        with instrumentation.phase('pohoda.validate'):
+            load_schema().validate(output.getvalue())
+        if hasattr(filename, 'write'):
+            filename.write(output.getvalue())
+        else:
+            with open(filename, 'wb') as f:
+                f.write(output.getvalue())
+
+
+def _qualified_name(tag):
+    if tag[:1] == '{':
+        uri, name = tag[1:].split('}', 1)
+        return '%s:%s' % (_PREFIXES[uri], name)
+    return tag
+
+
+def _escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _escape_attribute(value):
+    if not isinstance(value, str):
+        raise TypeError("cannot serialize %r (type %s)" % (value, type(value).__name__))
+    return _escape(value).replace('"', '&quot;').replace('\r', '&#13;').replace('\n', '&#10;').replace('\t', '&#09;')
+
+
+def _serialize(write, element):
+    """ Write the element the same way as ``ElementTree.write``, without namespace declarations. """
+    tag = _qualified_name(element.tag)
+    write('<' + tag)
+    for name, value in element.items():
+        write(' %s="%s"' % (_qualified_name(name), _escape_attribute(value)))
+    if element.text or len(element):
+        write('>')
+        if element.text:
+            write(_escape(element.text))
+        for child in element:
+            _serialize(write, child)
+        write('</%s>' % tag)
+    else:
+        write(' />')
+
+
+_DATA_PACK_END = b'</dat:dataPack>'
+
+
+class DataPackWriter(object):
+    """
+    Writer of many invoices into one Pohoda ``dataPack``.
+
+    Every invoice is converted to XML and written into the file as soon as it is
+    given to :meth:`write`, so the memory doesn't grow with number of the invoices.
+    The ``dataPack`` is finished by :meth:`close`, the writer can be used
+    as a context manager::
+
+        with DataPackWriter("invoices.xml", id="2024-07", ico=provider.ir) as writer:
+            for invoice in invoices:
+                writer.write(invoice)
+
+    Items with tax rates unknown to Pohoda are reported by one warning
+    for the whole data pack when it is closed.
+
+    :param file: file in which the XML will be written
+    :type file: string or binary File
+    :param id: identifier of the data pack
+    :param ico: IČO of the accounting unit the data are imported to, left None to omit it
+    :param note: note of the data pack
+    :param generator: generator class of the invoices
+    :param tax_rates: definition of tax rates used in Pohoda, left None for default values
+    :param validate: check every invoice against the Pohoda schema (see :func:`load_schema`)
+        before it is written, :class:`ValidationError` is raised if it is not valid
+    """
+
+    def __init__(self, file, id, ico=None, note="Generated from InvoiceGenerator", generator=SimpleInvoice, tax_rates=None,
+                 validate=False):
+        self.generator = generator
+        self.tax_rates = tax_rates
+        self.schema = load_schema() if validate else None
+        #: number of invoices written
+        self.count = 0
+        #: rates of the items missing in ``tax_rates`` -> number of the items in the data pack
+        self.unknown_tax_rates = collections.Counter()
+
+        attributes = [('version', "2.0"), ('id', id), ('ico', ico), ('application', "InvoiceGenerator"), ('note', note)]
+        header = ["<?xml version='1.0' encoding='UTF-8'?>\n<dat:dataPack"]
+        header.extend(' xmlns:%s="%s"' % (prefix, uri) for uri, prefix in sorted(_PREFIXES.items(), key=lambda ns: ns[1]))
+        header.extend(' %s="%s"' % (name, _escape_attribute(value)) for name, value in attributes if value is not None)
+        header.append('>')
+        self._header = ''.join(header).encode('utf-8')
 
-        tree = ET.ElementTree(data_pack)
-        tree.write(filename, encoding="UTF-8", xml_declaration=True)
+        if hasattr(file, 'write'):
+            self._file = file
+            self._close_file = False
+        else:
+            self._file = open(file, 'wb')
+            self._close_file = True
+        self._file.write(self._header)
+        #: number of bytes written
+        self.bytes_written = len(self._header)
+
+    def write(self, invoice):
+        """
+        Write the invoice into the data pack.
+
+        :param invoice: the invoice
+        :type invoice: Invoice
+        """
+        if self._file is None:
+            raise ValueError("The data pack is already closed")
+        chunks = []
+        with instrumentation.phase('pohoda.data_pack.write'):
+            generator = self.generator(invoice, self.tax_rates)
+            _serialize(chunks.append, generator._data_pack_item())
+            self.unknown_tax_rates.update(generator.unknown_tax_rates)
+            data_pack_item = ''.join(chunks).encode('utf-8')
+            if self.schema is not None:
+                # the invoice is validated alone, so the whole data pack never has to be in memory
+                with instrumentation.phase('pohoda.validate'):
+                    self.schema.validate(self._header + data_pack_item + _DATA_PACK_END)
+            self._file.write(data_pack_item)
+        self.count += 1
+        self.bytes_written += len(data_pack_item)
+
+    def close(self):
+        """ Finish the data pack and close the file if it was opened by the writer. """
+        if self._file is None:
+            return
+        self._file.write(_DATA_PACK_END)
+        self.bytes_written += len(_DATA_PACK_END)
+        self._finish()
+
+    def _finish(self):
+        if self._close_file:
+            self._file.close()
+        self._file = None
+        _log_unknown_tax_rates(self.unknown_tax_rates)
+        instrumentation.count('pohoda.data_pack.invoices', self.count)
+        instrumentation.count('pohoda.bytes', self.bytes_written, 'By')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            # unfinished data pack is not a valid XML, so it can't be imported by mistake
+            self._finish()
+
+
+def write_data_pack(invoices, file, id, ico=None, **kwargs):
+    """
+    Write the invoices into one Pohoda ``dataPack``, see :class:`DataPackWriter`.
+
+    :param invoices: iterable of :class:`InvoiceGenerator.api.Invoice` objects
+    :param file: file in which the XML will be written
+    :type file: string or binary File
+    :param id: identifier of the data pack
+    :param ico: IČO of the accounting unit the data are imported to
+    :param kwargs: passed to :class:`DataPackWriter`
+    :returns: number of the invoices written
+    """
+    with DataPackWriter(file, id, ico, **kwargs) as writer:
+        for invoice in invoices:
+            writer.write(invoice)
+    return writer.count
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from reportlab.lib.styles import ParagraphStyle
+
+
+__all__ = ['FrozenParagraphStyle', 'InvoiceStyleSheet', 'default_style_sheet']
+
+
+class FrozenParagraphStyle(ParagraphStyle):
+    """
+    Paragraph style which can't be modified once it is created.
+
+    It can be shared by all invoices and threads. Use :meth:`clone`
+    to get a modifiable copy.
+    """
+
+    def __init__(self, name, parent=None, **kw):
+        ParagraphStyle.__init__(self, name, parent, **kw)
+        self.__dict__['_frozen'] = True
+
+    def __setattr__(self, key, value):
+        if self.__dict__.get('_frozen'):
+            raise AttributeError("Style %s is frozen, use clone() to get modifiable copy" % self.name)
+        ParagraphStyle.__setattr__(self, key, value)
+
+    def __delattr__(self, key):
+        raise AttributeError("Style %s is frozen, use clone() to get modifiable copy" % self.name)
+
+    def refresh(self):
+        if self.__dict__.get('_frozen'):
+            raise AttributeError("Style %s is frozen, use clone() to get modifiable copy" % self.name)
+        ParagraphStyle.refresh(self)
+        # attributes copied from frozen parent
+        self.__dict__.pop('_frozen', None)
+
+    def _setKwds(self, **kw):
+        if self.__dict__.get('_frozen'):
+            raise AttributeError("Style %s is frozen, use clone() to get modifiable copy" % self.name)
+        ParagraphStyle._setKwds(self, **kw)
+
+    def clone(self, name, parent=None, **kwds):
+        """ Modifiable :class:`ParagraphStyle` with the same attributes. """
+        style = ParagraphStyle(name)
+        style.__dict__.update((key, value) for key, value in self.__dict__.items() if key != '_frozen')
+        style.name = name
+        style.parent = parent
+        style._setKwds(**kwds)
+        return style
+
+    def __copy__(self):
+        return self.clone(self.name)
+
+    def __deepcopy__(self, memo):
+        return self.clone(self.name)
+
+
+class InvoiceStyleSheet(object):
+    """
+    Fonts and paragraph styles of the PDF invoice.
+
+    The styles are built once and can't be modified, so one style sheet
+    is shared by all invoices generated with it.
+
+    :param font: name of the regular face, see ``conf.FONTS``
+    :param bold_font: name of the bold face
+    :param styles: overrides of the paragraph styles, name of the style
+        (``header``, ``address``, ``note``, ``item``) -> dict of its attributes,
+        e.g. ``item={'fontSize': 8, 'leading': 9.6}``
+    """
+
+    def __init__(self, font='DejaVu', bold_font='DejaVu-Bold', **styles):
+        unknown = set(styles) - {'header', 'address', 'note', 'item'}
+        if unknown:
+            raise ValueError("Unknown styles: %s" % ", ".join(sorted(unknown)))
+        self.font = font
+        self.bold_font = bold_font
+
+        def style(name, parent=None, **attributes):
+            attributes.update(styles.get(name, {}))
+            return FrozenParagraphStyle(name, parent, **attributes)
+
+        #: heading of the provider and client boxes
+        self.header = style('header', fontName=font, fontSize=12, leading=15)
+        #: lines of the provider and client address
+        self.address = style('address', fontName=font, fontSize=8, leading=8.5)
+        #: note under the address
+        self.note = style('note', parent=self.address, fontSize=6, leading=6)
+        #: description of the item
+        self.item = style('item', fontName=font, fontSize=7)
+
+    @property
+    def fonts(self):
+        """ Names of the faces used by the style sheet. """
+        return (self.font, self.bold_font)
+
+
+#: style sheet used by the generators unless they are given another one
+default_style_sheet = InvoiceStyleSheet()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import collections
+import collections.abc
+import copy
+import threading
+
+from InvoiceGenerator import conf
+
+from reportlab.pdfbase import pdfmetrics
+
+
+__all__ = ['StaticLayer', 'TemplateCache', 'default_template_cache']
+
+
+class StaticLayer(object):
+    """
+    Forms with the parts of the invoice which are the same for many invoices
+    (boxes, provider, header of the item table), drawn once and replayed into other documents.
+
+    The forms must be the first thing drawn into the document: text in TrueType fonts
+    is encoded by subsets which are built as the characters are used, so the forms
+    can be reused only in documents where no such text was drawn yet. The subsets and
+    font names the forms use are recorded with them and set up in the documents they
+    are replayed into, the result is the same as if the forms were drawn again.
+
+    :param forms: tuple of ``(name, code)`` pairs, code is list of PDF operators of the form
+    :param values: anything the drawing returned and is needed to use the forms
+    """
+
+    def __init__(self, forms, values, fonts_before, font_mapping, font_states):
+        self.forms = forms
+        self.values = values
+        self._fonts_before = fonts_before
+        self._font_mapping = font_mapping
+        self._font_states = font_states
+
+    @property
+    def reusable(self):
+        """ Can the forms be replayed into other documents? """
+        return self._font_states is not None
+
+    @staticmethod
+    def _supported(doc):
+        # the layers copy internal state of reportlab documents and fonts (reportlab 3.x - 5.x),
+        # with other layout of the state they are used only in the document they were drawn into
+        return isinstance(getattr(doc, 'fontMapping', None), dict) and isinstance(getattr(doc, 'delayedFonts', None), list)
+
+    @staticmethod
+    def _fonts(doc):
+        return tuple(doc.fontMapping.items()), tuple(font.fontName for font in doc.delayedFonts)
+
+    @classmethod
+    def record(cls, canvas, forms):
+        """
+        Draw the forms into the canvas and record them.
+
+        :param canvas: canvas of the document, nothing may have been drawn into it yet
+        :param forms: list of ``(name, draw)`` pairs, ``draw`` is function drawing the form
+            into the canvas, its return value is kept in :attr:`values`
+        :rtype: StaticLayer
+        """
+        doc = canvas._doc
+        fonts_before = cls._fonts(doc) if cls._supported(doc) else None
+        recorded = []
+        values = []
+        for name, draw in forms:
+            canvas.beginForm(name)
+            values.append(draw())
+            recorded.append((name, list(canvas._code)))
+            canvas.endForm()
+        if fonts_before is None or fonts_before[1]:
+            # text was drawn before the forms, they can be used only in this document
+            return cls(tuple(recorded), tuple(values), fonts_before, None, None)
+        font_mapping = tuple(item for item in doc.fontMapping.items() if item not in fonts_before[0])
+        # fonts used by the forms in order of their embedding, then fonts with characters
+        # assigned before the forms were drawn (``FontRegistry.presubset``)
+        if not all(isinstance(getattr(font, 'state', None), collections.abc.MutableMapping) for font in doc.delayedFonts):
+            return cls(tuple(recorded), tuple(values), fonts_before, None, None)
+        font_states = [(font, copy.deepcopy(font.state[doc]), True) for font in doc.delayedFonts]
+        for name in pdfmetrics.getRegisteredFontNames():
+            font = pdfmetrics.getFont(name)
+            if getattr(font, '_dynamicFont', False) and doc in font.state and font not in doc.delayedFonts:
+                font_states.append((font, copy.deepcopy(font.state[doc]), False))
+        return cls(tuple(recorded), tuple(values), fonts_before, font_mapping, tuple(font_states))
+
+    def replay(self, canvas):
+        """
+        Define the forms in the canvas.
+
+        :param canvas: canvas of the document, nothing may have been drawn into it yet
+        :returns: ``False`` if the forms can't be used in the document, they have to be drawn
+        """
+        doc = canvas._doc
+        if not self.reusable or not self._supported(doc) or self._fonts(doc) != self._fonts_before or any(doc in font.state for font, _s, _e in self._font_states):
+            return False
+        doc.fontMapping.update(self._font_mapping)
+        for font, state, embedded in self._font_states:
+            font.state[doc] = copy.deepcopy(state)
+            if embedded:
+                doc.delayedFonts.append(font)
+        for name, code in self.forms:
+            canvas.beginForm(name)
+            canvas._code.extend(code)
+            canvas.endForm()
+        return True
+
+
+class TemplateCache(object):
+    """
+    Process-wide LRU cache of :class:`StaticLayer` objects.
+
+    :param maxsize: maximal number of the kept layers, ``conf.TEMPLATE_CACHE_SIZE`` if ``None``
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._layers = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Layer stored under the key or ``None``. """
+        with self._lock:
+            layer = self._layers.get(key)
+            if layer is None:
+                self.misses += 1
+            else:
+                self._layers.move_to_end(key)
+                self.hits += 1
+            return layer
+
+    def put(self, key, layer):
+        with self._lock:
+            self._layers[key] = layer
+            self._layers.move_to_end(key)
+            maxsize = conf.TEMPLATE_CACHE_SIZE if self.maxsize is None else self.maxsize
+            while len(self._layers) > maxsize:
+                self._layers.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._layers.clear()
+
+
+#: cache shared by the PDF generators unless they are given another one, see ``SimpleInvoice.template_cache``
+default_template_cache = TemplateCache()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Time and memory of the PDF and Pohoda generators and of the QR code for invoices of various sizes.
+
+Run with ``python -m pytest benchmarks/bench_generators.py``. Peak RSS of a forked
+process generating the invoice once is reported in the ``extra_info`` of every
+benchmark (``--benchmark-verbose`` or ``--benchmark-json``): ``peak_rss`` is the peak
+of the whole process, ``peak_rss_growth`` how much it grew while generating the invoice
+(kilobytes on Linux, bytes on macOS). It is not measured where ``fork`` isn't available.
+``bench_pdf_compression`` reports size of the PDF as ``bytes``.
+"""
+import datetime
+import io
+import multiprocessing
+
+from InvoiceGenerator import pohoda
+from InvoiceGenerator.api import Client, Correction, Creator, Invoice, Provider, QrCodeBuilder, qr_cache_clear
+from InvoiceGenerator.pdf import CorrectingInvoice, ProformaInvoice, SimpleInvoice, write_invoices
+
+import pytest
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+SIZES = [1, 10, 100, 1000, 10000]
+
+
+def _invoice(size, model=Invoice):
+    provider = Provider('Provider s.r.o.', 'Street 1', 'Prague', '11000', ir='12345678', vat_id='CZ12345678',
+                        bank_account='2600420569', bank_code='2010')
+    client = Client('Client a.s.', 'Street 2', 'Brno', '60200', ir='87654321', note='Registered in Brno')
+    invoice = model(client, provider, Creator('Creator'))
+    invoice.number = 'F20240001'
+    invoice.variable_symbol = '20240001'
+    invoice.use_tax = True
+    invoice.payback = datetime.date(2024, 8, 14)
+    invoice.taxable_date = datetime.date(2024, 7, 14)
+    invoice.reason = 'Wrong quantity'
+    invoice.add_items(
+        (i % 7 + 1, '12.50', 'Item %d' % i if i % 5 else 'Long description of item %d ' % i * 4, 'h', (21, 15, 0)[i % 3])
+        for i in range(size)
+    )
+    return invoice
+
+
+def _rounds(size):
+    return max(1, min(20, 2000 // size))
+
+
+def _peak_rss(func):
+    if resource is None or 'fork' not in multiprocessing.get_all_start_methods():
+        return {}
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+
+    def run():
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        func()
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        sender.send({'peak_rss': after, 'peak_rss_growth': after - before})
+
+    process = context.Process(target=run)
+    process.start()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def _bench(benchmark, size, func, rounds=None):
+    benchmark.extra_info.update(_peak_rss(func))
+    benchmark.pedantic(func, rounds=rounds or _rounds(size), warmup_rounds=1 if size <= 100 else 0)
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('generator, model', [
+    (SimpleInvoice, Invoice),
+    (ProformaInvoice, Invoice),
+    (CorrectingInvoice, Correction),
+], ids=['SimpleInvoice', 'ProformaInvoice', 'CorrectingInvoice'])
+def bench_pdf(benchmark, generator, model, size):
+    invoice = _invoice(size, model)
+    _bench(benchmark, size, lambda: generator(invoice).gen(io.BytesIO()))
+
+
+@pytest.mark.parametrize('presubset_fonts', [False, True], ids=['subset', 'presubset'])
+@pytest.mark.parametrize('compression_level', [None, 0, 1, 6, 9])
+def bench_pdf_compression(benchmark, compression_level, presubset_fonts):
+    invoice = _invoice(100)
+
+    def gen():
+        pdf = SimpleInvoice(invoice)
+        pdf.compression_level = compression_level
+        pdf.presubset_fonts = presubset_fonts
+        output = io.BytesIO()
+        pdf.gen(output)
+        return output
+
+    benchmark.extra_info['bytes'] = len(gen().getvalue())
+    _bench(benchmark, 100, gen)
+
+
+@pytest.mark.parametrize('count', [10, 100, 1000])
+@pytest.mark.parametrize('one_file', [False, True], ids=['separate', 'one_file'])
+def bench_pdf_print_run(benchmark, count, one_file):
+    invoices = [_invoice(3) for i in range(count)]
+
+    def gen():
+        if one_file:
+            write_invoices(invoices, io.BytesIO())
+        else:
+            for invoice in invoices:
+                SimpleInvoice(invoice).gen(io.BytesIO())
+
+    _bench(benchmark, count, gen, rounds=max(1, 100 // count))
+
+
+@pytest.mark.parametrize('size', SIZES)
+def bench_pohoda(benchmark, size):
+    invoice = _invoice(size)
+    _bench(benchmark, size, lambda: pohoda.SimpleInvoice(invoice).gen(io.BytesIO()))
+
+
+@pytest.mark.parametrize('size', SIZES)
+def bench_qr_code(benchmark, size):
+    invoice = _invoice(size)
+
+    def build():
+        # encoded QR codes are cached, measure the encoding
+        qr_cache_clear()
+        return QrCodeBuilder(invoice).image
+
+    _bench(benchmark, size, build, rounds=20)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Import time of the modules in a fresh interpreter.
+
+Run with ``python -m pytest benchmarks/bench_import.py``. The timed round includes
+start of the interpreter; time of the import itself reported by ``python -X importtime``
+is in the ``extra_info`` of every benchmark (``import_us``, microseconds) together with
+the heavy packages the import loaded (``loaded``).
+"""
+import subprocess
+import sys
+
+import pytest
+
+
+MODULES = [
+    'InvoiceGenerator.api',
+    'InvoiceGenerator.pohoda',
+    'InvoiceGenerator.pdf',
+    'InvoiceGenerator.batch',
+    'InvoiceGenerator.aio',
+]
+HEAVY = ('asyncio', 'babel', 'lxml', 'PIL', 'qrcode', 'qrplatba', 'reportlab')
+
+
+def _import(module):
+    code = "import sys, %s; print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))" % module
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, check=True)
+
+
+def _import_time(stderr, module):
+    for line in stderr.decode().splitlines():
+        _self, _sep, rest = line.partition('|')
+        cumulative, _sep, name = rest.partition('|')
+        if name.strip() == module:
+            return int(cumulative)
+
+
+@pytest.mark.parametrize('module', MODULES)
+def bench_import(benchmark, module):
+    result = _import(module)
+    packages = set(result.stdout.decode().split())
+    benchmark.extra_info['import_us'] = _import_time(result.stderr, module)
+    benchmark.extra_info['loaded'] = sorted(packages.intersection(HEAVY))
+    benchmark.pedantic(_import, (module,), rounds=5, warmup_rounds=1)
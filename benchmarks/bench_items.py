@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Memory and construction time of the invoice models.
+
+Run with ``python -m pytest benchmarks/bench_items.py``, memory per object
+is reported in the ``extra_info`` of every benchmark (``--benchmark-verbose``
+or ``--benchmark-json``).
+"""
+import tracemalloc
+from decimal import Decimal
+
+from InvoiceGenerator.api import Address, Client, Creator, Invoice, Item, Provider
+
+import pytest
+
+
+ITEMS = 50000
+
+
+def _memory_per_object(factory, count=ITEMS):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [factory(i) for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+@pytest.mark.parametrize('factory', [
+    lambda i: Item(i, '12.50', 'Item %d' % i, 'h', 21),
+    lambda i: Item(Decimal(i), Decimal('12.50'), tax=Decimal(21)),
+], ids=['str-int', 'decimal'])
+def bench_item(benchmark, factory):
+    benchmark.extra_info['bytes_per_object'] = _memory_per_object(factory)
+    benchmark(lambda: [factory(i) for i in range(ITEMS)])
+
+
+@pytest.mark.parametrize('model', [Address, Client, Provider])
+def bench_address(benchmark, model):
+    def factory(i):
+        return model('Company %d' % i, 'Street %d' % i, 'Prague', '11000', vat_id='CZ%d' % i)
+
+    benchmark.extra_info['bytes_per_object'] = _memory_per_object(factory, ITEMS // 10)
+    benchmark(lambda: [factory(i) for i in range(ITEMS // 10)])
+
+
+def bench_creator(benchmark):
+    def factory(i):
+        return Creator('Creator %d' % i, 'stamp.png')
+
+    benchmark.extra_info['bytes_per_object'] = _memory_per_object(factory, ITEMS // 10)
+    benchmark(lambda: [factory(i) for i in range(ITEMS // 10)])
+
+
+def bench_invoice_add_item(benchmark):
+    items = [Item(i, '12.50', 'Item %d' % i, 'h', 21) for i in range(ITEMS)]
+
+    def build():
+        invoice = Invoice(Client('Client'), Provider('Provider'), Creator('Creator'))
+        for item in items:
+            invoice.add_item(item)
+        return invoice.price_tax
+
+    benchmark(build)
+
+
+def bench_invoice_add_items(benchmark):
+    rows = [(i, '12.50', 'Item %d' % i, 'h', 21) for i in range(ITEMS)]
+
+    def build():
+        invoice = Invoice(Client('Client'), Provider('Provider'), Creator('Creator'))
+        invoice.add_items(rows)
+        return invoice.price_tax
+
+    benchmark(build)
+
+
+def bench_invoice_add_item_columns(benchmark):
+    counts = list(range(ITEMS))
+    prices = ['12.50'] * ITEMS
+    descriptions = ['Item %d' % i for i in range(ITEMS)]
+    taxes = [21] * ITEMS
+
+    def build():
+        invoice = Invoice(Client('Client'), Provider('Provider'), Creator('Creator'))
+        invoice.add_item_columns(counts, prices, descriptions, taxes=taxes)
+        return invoice.price_tax
+
+    benchmark(build)
@@ -72,6 +72,7 @@ setup(
             "flake8-tidy-imports",
         ],
         "docs": "sphinx",
+        "validation": "lxml",
     },
     include_package_data=True,
     test_suite="tests",
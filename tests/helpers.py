@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from InvoiceGenerator.api import Client, Creator, Invoice, Provider
+
+
+def build_invoice(number='F1', items=None, model=Invoice, client=None, provider=None, **attrs):
+    """
+    Invoice for the tests.
+
+    :param items: ``Item`` objects, tuples or dicts, see ``Invoice.add_items``;
+        one item described by the number if omitted
+    :param model: ``Invoice`` or ``Correction``
+    :param client: ``Client('Kkkk')`` if omitted
+    :param provider: ``Provider('Pupik')`` with bank account if omitted
+    :param attrs: other attributes of the invoice, e.g. ``language``
+    """
+    client = client or Client('Kkkk')
+    provider = provider or Provider('Pupik', bank_account='2600420569', bank_code='2010')
+    invoice = model(client, provider, Creator('blah'))
+    invoice.number = number
+    for name, value in attrs.items():
+        setattr(invoice, name, value)
+    invoice.add_items([(42, 666, 'Item %s' % number)] if items is None else items)
+    return invoice
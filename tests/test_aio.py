@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from InvoiceGenerator import aio, pohoda
+from InvoiceGenerator.batch import warm_up
+from InvoiceGenerator.i18n import override
+from InvoiceGenerator.pdf import ProformaInvoice, SimpleInvoice
+
+from PyPDF2 import PdfReader
+
+from tests.helpers import build_invoice
+
+
+class SlowInvoice(SimpleInvoice):
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+    calls = 0
+
+    def gen(self, filename):
+        with self.lock:
+            SlowInvoice.calls += 1
+            SlowInvoice.running += 1
+            SlowInvoice.max_running = max(SlowInvoice.running, SlowInvoice.max_running)
+        time.sleep(0.05)
+        with self.lock:
+            SlowInvoice.running -= 1
+
+
+class AgenTest(unittest.TestCase):
+
+    def test_pdf(self):
+        async def generate():
+            outputs = [io.BytesIO() for i in range(3)]
+            await asyncio.gather(*(
+                SimpleInvoice(build_invoice('F%d' % i)).agen(output, generate_qr_code=True) for i, output in enumerate(outputs)
+            ))
+            return outputs
+
+        for i, output in enumerate(asyncio.run(generate())):
+            self.assertIn('Item F%d' % i, PdfReader(output).pages[0].extract_text())
+
+    def test_language_context(self):
+        async def generate(output):
+            with override('en'):
+                await ProformaInvoice(build_invoice('F1')).agen(output)
+
+        output = io.BytesIO()
+        asyncio.run(generate(output))
+        self.assertIn('Document num.: F1', PdfReader(output).pages[0].extract_text())
+
+    def test_pohoda(self):
+        output = io.BytesIO()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            asyncio.run(pohoda.SimpleInvoice(build_invoice('F1')).agen(output, executor=executor))
+        self.assertIn(b'<inv:text>Item F1</inv:text>', output.getvalue())
+
+
+class RenderManyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        SlowInvoice.running = SlowInvoice.max_running = SlowInvoice.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    async def _collect(self, *args, **kwargs):
+        return [result async for result in aio.render_many(*args, **kwargs)]
+
+    def test_render_many(self):
+        invoices = [build_invoice('F%d' % i) for i in range(3)] + [(build_invoice('P1'), ProformaInvoice)]
+        results = sorted(asyncio.run(self._collect(invoices, self.out_dir, limit=2)))
+        self.assertEqual([0, 1, 2, 3], [result.index for result in results])
+        self.assertTrue(all(result.ok for result in results))
+        self.assertIn('Item P1', PdfReader(results[3].filename).pages[0].extract_text())
+
+    def test_process_executor(self):
+        with ProcessPoolExecutor(max_workers=2, initializer=warm_up) as executor:
+            results = asyncio.run(self._collect([build_invoice('F1'), build_invoice('F2')], self.out_dir, executor=executor))
+        self.assertEqual(['F1.pdf', 'F2.pdf'], sorted(os.path.basename(result.filename) for result in results))
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_limit(self):
+        invoices = ((build_invoice('F%d' % i), SlowInvoice) for i in range(8))
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = asyncio.run(self._collect(invoices, self.out_dir, executor=executor, limit=3))
+        self.assertEqual(8, len(results))
+        self.assertEqual(3, SlowInvoice.max_running)
+
+    def test_cancel(self):
+        async def first_result(executor):
+            async for result in aio.render_many(invoices, self.out_dir, executor=executor, limit=4):
+                return result
+
+        invoices = [(build_invoice('F%d' % i), SlowInvoice) for i in range(20)]
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            result = asyncio.run(first_result(executor))
+        self.assertTrue(result.ok)
+        self.assertLess(SlowInvoice.calls, 4)
@@ -1,14 +1,20 @@
 # -*- coding: utf-8 -*-
 import decimal
+import os
+import pickle
 import unittest
 import uuid
 from decimal import Decimal
+from unittest import mock
 
+from InvoiceGenerator import conf
 from InvoiceGenerator.api import Address, Client, Creator, Invoice, \
-    Item, Provider
+    Item, Provider, QrCodeBuilder, qr_cache_clear, qr_cache_info
 
 from six import string_types
 
+from tests.helpers import build_invoice
+
 
 class AddressTest(unittest.TestCase):
 
@@ -48,6 +54,13 @@ class AddressTest(unittest.TestCase):
         expected = [phone, email]
         self.assertEqual(expected, address._get_contact_lines())
 
+    def test_slots(self):
+        address = self.addresss_object('Foo s.r.o.', city='Prague')
+        self.assertFalse(hasattr(address, '__dict__'))
+        self.assertRaises(AttributeError, setattr, address, 'citi', 'Brno')
+        copy = pickle.loads(pickle.dumps(address))
+        self.assertEqual(['Foo s.r.o.', '', 'Prague'], copy._get_address_lines())
+
 
 class ClientTest(AddressTest):
     addresss_object = Client
@@ -153,6 +166,12 @@ class ItemTest(unittest.TestCase):
         self.assertIsInstance(item.tax, Decimal)
         self.assertEqual(1008, item.total_tax)
 
+    def test_slots(self):
+        item = Item(24, 42, 'Foo', 'hour', tax=21)
+        self.assertFalse(hasattr(item, '__dict__'))
+        copy = pickle.loads(pickle.dumps(item))
+        self.assertEqual((24, 42, 'Foo', 'hour', 21), (copy.count, copy.price, copy.description, copy.unit, copy.tax))
+
 
 class InvoiceTest(unittest.TestCase):
 
@@ -250,3 +269,150 @@ class InvoiceTest(unittest.TestCase):
         self.assertEqual(1754, invoice.price_tax)
         invoice.rounding_strategy = decimal.ROUND_HALF_UP
         self.assertEqual(1755, invoice.price_tax)
+
+    def test_totals_follow_items(self):
+        invoice = Invoice(Client('Foo'), Provider('Bar'), Creator('Blah'))
+        invoice.add_item(Item(1, 500, tax=50))
+        self.assertEqual(750, invoice.price_tax)
+        invoice.add_item(Item(2, 100))
+        self.assertEqual(700, invoice.price)
+        self.assertEqual(950, invoice.price_tax)
+
+        invoice.items[0].count = 2
+        self.assertEqual(1200, invoice.price)
+        invoice.items[1].tax = 10
+        self.assertEqual(1720, invoice.price_tax)
+
+        invoice.items.append(Item(1, 80, tax=10))
+        self.assertEqual(1280, invoice.price)
+        del invoice.items[0]
+        self.assertEqual(280, invoice.price)
+        self.assertEqual({10: {'total': 280, 'total_tax': 308, 'tax': 28}}, invoice.generate_breakdown_vat())
+
+    def test_sort_items(self):
+        invoice = Invoice(Client('Foo'), Provider('Bar'), Creator('Blah'))
+        invoice.add_items([(1, 300, 'C', '', 50), (2, 100, 'A'), (1, 200, 'B', '', 10)])
+        self.assertEqual(Decimal('870'), invoice.price_tax)
+        invoice.items.sort(key=lambda item: item.price)
+        self.assertEqual(['A', 'B', 'C'], [item.description for item in invoice.items])
+        invoice.items.sort(key=lambda item: item.description, reverse=True)
+        self.assertEqual(['C', 'B', 'A'], [item.description for item in invoice.items])
+        invoice.items[0].count = 2
+        self.assertEqual(Decimal('1320'), invoice.price_tax)
+        self.assertEqual([0, 10, 50], sorted(invoice.generate_breakdown_vat()))
+
+    def test_totals_per_invoice(self):
+        first = Invoice(Client('Foo'), Provider('Bar'), Creator('Blah'))
+        second = Invoice(Client('Foo'), Provider('Bar'), Creator('Blah'))
+        shared = Item(1, 100)
+        first.add_item(Item(1, 500))
+        first.add_item(shared)
+        second.add_items([Item(1, 50), shared])
+        self.assertEqual((600, 150), (first.price, second.price))
+        totals = second._totals
+
+        first.items[0].price = 400
+        self.assertEqual(500, first.price)
+        self.assertIs(totals, second._get_totals())
+
+        shared.count = 2
+        self.assertEqual((600, 250), (first.price, second.price))
+
+        copy = pickle.loads(pickle.dumps(first))
+        copy.items[1].count = 3
+        self.assertEqual((700, 600), (copy.price, first.price))
+
+    def test_add_items(self):
+        invoice = Invoice(Client('Foo'), Provider('Bar'), Creator('Blah'))
+        invoice.add_item(Item(1, 500, tax=50))
+        self.assertEqual(750, invoice.price_tax)
+        item = Item(2, 100)
+        invoice.add_items([
+            item,
+            (3, '10.5', 'Foo', 'h', 21),
+            {'count': 1, 'price': 200, 'tax': 50},
+        ])
+        self.assertEqual(4, len(invoice.items))
+        self.assertIs(item, invoice.items[1])
+        self.assertEqual(('Foo', 'h', 21), (invoice.items[2].description, invoice.items[2].unit, invoice.items[2].tax))
+        self.assertEqual(Decimal('931.5'), invoice.price)
+        self.assertEqual(Decimal('1288.115'), invoice._price_tax_unrounded())
+        self.assertEqual(
+            {50: {'total': 700, 'total_tax': 1050, 'tax': 350}, 0: {'total': 200, 'total_tax': 200, 'tax': 0},
+             21: {'total': Decimal('31.5'), 'total_tax': Decimal('38.115'), 'tax': Decimal('6.615')}},
+            invoice.generate_breakdown_vat(),
+        )
+
+    def test_add_items_invalid(self):
+        invoice = Invoice(Client('Foo'), Provider('Bar'), Creator('Blah'))
+        invoice.add_item(Item(1, 500))
+        self.assertEqual(500, invoice.price)
+        self.assertRaises(decimal.InvalidOperation, invoice.add_items, [(1, 100), ('x', 100)])
+        self.assertEqual(1, len(invoice.items))
+        self.assertEqual(500, invoice.price)
+        self.assertRaises(TypeError, invoice.add_items, [{'cnt': 1}])
+
+    def test_add_item_columns(self):
+        invoice = Invoice(Client('Foo'), Provider('Bar'), Creator('Blah'))
+        invoice.add_item_columns([1, 2], ['10', '20'], taxes=(0, 50))
+        self.assertEqual(50, invoice.price)
+        self.assertEqual(70, invoice.price_tax)
+        self.assertEqual(['', ''], [item.description for item in invoice.items])
+        invoice.add_item_columns([1], [1], descriptions=['Foo'], units=['h'])
+        self.assertEqual(('Foo', 'h', 0), (invoice.items[2].description, invoice.items[2].unit, invoice.items[2].tax))
+        self.assertRaises(ValueError, invoice.add_item_columns, [1, 2], [1])
+        self.assertEqual(3, len(invoice.items))
+
+    def test_breakdown_is_copy(self):
+        invoice = Invoice(Client('Foo'), Provider('Bar'), Creator('Blah'))
+        invoice.add_item(Item(1, 500, tax=50))
+        invoice.generate_breakdown_vat()[50]['total'] = 0
+        self.assertEqual(500, invoice.generate_breakdown_vat()[50]['total'])
+
+    def test_pickle(self):
+        invoice = Invoice(Client('Foo'), Provider('Bar'), Creator('Blah'))
+        invoice.add_item(Item(1, 500, tax=50))
+        self.assertEqual(750, invoice.price_tax)
+        copy = pickle.loads(pickle.dumps(invoice))
+        copy.add_item(Item(1, 100))
+        self.assertEqual(850, copy.price_tax)
+        self.assertEqual(750, invoice.price_tax)
+
+
+class QrCodeBuilderTest(unittest.TestCase):
+
+    def test_image(self):
+        builder = QrCodeBuilder(build_invoice(items=[(1, 500)], variable_symbol='000000001'))
+        image = builder.image
+        self.assertIs(image, builder.image)
+        self.assertEqual(image.size[0], image.size[1])
+        self.assertIsNone(builder.tmp_file)
+
+    def test_matrix(self):
+        matrix = QrCodeBuilder(build_invoice(items=[(1, 500)], variable_symbol='000000001')).matrix
+        self.assertEqual(len(matrix), len(matrix[0]))
+        self.assertTrue(any(any(row) for row in matrix))
+
+    def test_filename(self):
+        builder = QrCodeBuilder(build_invoice(items=[(1, 500)], variable_symbol='000000001'))
+        filename = builder.filename
+        self.assertTrue(os.path.isfile(filename))
+        builder.destroy()
+        self.assertFalse(os.path.isfile(filename))
+
+    def test_cache(self):
+        qr_cache_clear()
+        invoice = build_invoice(items=[(1, 500)], variable_symbol='000000001')
+        image = QrCodeBuilder(invoice).image
+        self.assertIs(image, QrCodeBuilder(build_invoice(items=[(1, 500)], variable_symbol='000000001')).image)
+        self.assertEqual((1, 1), qr_cache_info()[:2])
+
+        invoice.add_item(Item(1, 500))
+        self.assertIsNot(image, QrCodeBuilder(invoice).image)
+        self.assertEqual((1, 2), qr_cache_info()[:2])
+
+    def test_cache_size(self):
+        self.addCleanup(qr_cache_clear)
+        with mock.patch.object(conf, 'QR_CACHE_SIZE', 1):
+            qr_cache_clear()
+            self.assertEqual(1, qr_cache_info().maxsize)
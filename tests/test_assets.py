@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from InvoiceGenerator import assets
+from InvoiceGenerator.assets import FlateFilter, FontRegistry, FontSubsetCache, ImageCache
+from InvoiceGenerator.conf import FONT_BOLD_PATH, FONT_PATH
+
+from PIL import Image
+
+from PyPDF2 import PdfReader
+
+import reportlab
+from reportlab.lib.fonts import tt2ps
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFontFace
+from reportlab.pdfgen.canvas import Canvas
+
+
+class FontRegistryTest(unittest.TestCase):
+
+    def _registry(self):
+        return FontRegistry(
+            {'TestFace': FONT_PATH, 'TestFace-Bold': FONT_BOLD_PATH},
+            {'TestFamily': ('TestFace', 'TestFace-Bold')},
+        )
+
+    def test_face_is_loaded_once(self):
+        registry = self._registry()
+        with mock.patch.object(assets, 'TTFont', wraps=assets.TTFont) as ttfont:
+            registry.ensure('TestFace')
+            registry.ensure('TestFace')
+            registry.ensure('TestFace', 'TestFace-Bold')
+        self.assertEqual(2, ttfont.call_count)
+        self.assertIn('TestFace', pdfmetrics.getRegisteredFontNames())
+
+    def test_ensure_from_threads(self):
+        registry = self._registry()
+        with mock.patch.object(assets, 'TTFont', wraps=assets.TTFont) as ttfont:
+            threads = [threading.Thread(target=registry.ensure, args=('TestFace',)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(1, ttfont.call_count)
+
+    def test_family(self):
+        registry = self._registry()
+        registry.ensure('TestFamily')
+        self.assertEqual('TestFace-Bold', tt2ps('TestFamily', 1, 0))
+
+    def test_subsets_of_registered_font(self):
+        # font registered by the application before, reportlab keeps it
+        path = os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'VeraIt.ttf')
+        pdfmetrics.registerFont(TTFont('AppFace', path))
+        registry = FontRegistry({'AppFace': path}, subset_cache=FontSubsetCache())
+        registry.ensure('AppFace')
+        canvas = Canvas(io.BytesIO())
+        canvas.setFont('AppFace', 10)
+        canvas.drawString(10, 10, u'Vera')
+        canvas.save()
+        self.assertEqual(1, registry.subset_cache.misses)
+
+    def test_unknown_font(self):
+        self.assertRaises(KeyError, self._registry().ensure, 'Comic Sans')
+
+    def test_add_font(self):
+        registry = self._registry()
+        registry.add_font('TestSerif', FONT_PATH)
+        registry.ensure('TestSerif')
+        registry.add_font('TestSerif', FONT_PATH)
+        self.assertRaises(ValueError, registry.add_font, 'TestSerif', FONT_BOLD_PATH)
+
+
+class FontSubsetCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        # faces are shared by all registries, use the cache of the default one
+        self.registry = assets.font_registry
+        self.registry.ensure('DejaVu')
+        self.cache = assets.font_subset_cache
+        self.cache.clear()
+        self.cache.hits = self.cache.misses = 0
+
+    def tearDown(self):
+        self.cache.maxsize = FontSubsetCache().maxsize
+
+    def _generate(self, text, presubset=None, level=-1):
+        output = io.BytesIO()
+        canvas = Canvas(output, pageCompression=0)
+        canvas._doc.defaultStreamFilters = [FlateFilter(level, self.cache)]
+        if presubset:
+            self.registry.presubset(canvas, presubset)
+        canvas.setFont('DejaVu', 10)
+        canvas.drawString(10, 10, text)
+        canvas.save()
+        return PdfReader(output)
+
+    def test_subset_is_made_once(self):
+        for i in range(3):
+            pdf = self._generate(u'Žluťoučký kůň')
+            self.assertIn(u'Žluťoučký kůň', pdf.pages[0].extract_text())
+        self.assertEqual((2, 1), (self.cache.hits, self.cache.misses))
+
+        self._generate(u'kůň Žluťoučký')
+        self.assertEqual((2, 2), (self.cache.hits, self.cache.misses))
+
+    def test_presubset(self):
+        for text in (u'Žluťoučký kůň', u'kůň Žluťoučký', u'úpěl'):
+            pdf = self._generate(text, presubset=u'ŽůťčýňĚěšú')
+            self.assertIn(text, pdf.pages[0].extract_text())
+        self.assertEqual((2, 1), (self.cache.hits, self.cache.misses))
+
+    def test_maxsize(self):
+        self.cache.maxsize = 2
+        for text in (u'á', u'é', u'í', u'á'):
+            self._generate(text)
+        self.assertEqual((0, 4), (self.cache.hits, self.cache.misses))
+
+    def test_maxsize_same_content(self):
+        self.cache.maxsize = 2
+        face = mock.Mock(filename='font.ttf', subfontNameX=b'', makeSubset=lambda subset: b'subset' if subset[0] < 3 else bytes(subset))
+        face.name = b'Font'
+        for subset in ([1], [2], [3], [4]):
+            self.cache.subset(face, subset)
+        self.assertEqual((0, 4), (self.cache.hits, self.cache.misses))
+        self.assertEqual(b'subset', self.cache.subset(face, [2]))
+
+    def test_compressed_subset(self):
+        face = TTFontFace(FONT_PATH)
+        content = self.cache.subset(face, [0, 65, 66])
+        compressed = self.cache.compress(content, 9)
+        self.assertIs(compressed, self.cache.compress(content, 9))
+        self.assertEqual(content, FlateFilter(1).decode(self.cache.compress(content, 1)))
+        self.assertEqual(content, FlateFilter(9).decode(compressed))
+
+    def test_compression_level(self):
+        sizes = []
+        for level in (0, 1, 9):
+            output = io.BytesIO()
+            canvas = Canvas(output, pageCompression=0)
+            canvas._doc.defaultStreamFilters = [FlateFilter(level, self.cache)] if level else None
+            canvas.setFont('DejaVu', 10)
+            for i in range(100):
+                canvas.drawString(10, 10 + i * 5, u'Řádek %d' % i)
+            canvas.save()
+            self.assertIn(u'Řádek 99', PdfReader(output).pages[0].extract_text())
+            sizes.append(len(output.getvalue()))
+        self.assertGreater(sizes[0], sizes[1])
+        self.assertGreaterEqual(sizes[1], sizes[2])
+
+
+class ImageCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'logo.png')
+        Image.new('RGBA', (40, 20), (255, 0, 0, 128)).save(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get(self):
+        cache = ImageCache()
+        asset = cache.get(self.path)
+        self.assertEqual((40, 20), (asset.width, asset.height))
+        self.assertIs(asset, cache.get(self.path))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_get_from_threads(self):
+        cache = ImageCache()
+        threads = [threading.Thread(target=lambda: [cache.get(self.path) for i in range(200)]) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((1599, 1), (cache.hits, cache.misses))
+
+    def test_invalidate_by_mtime(self):
+        cache = ImageCache()
+        asset = cache.get(self.path)
+        Image.new('RGB', (10, 20)).save(self.path)
+        os.utime(self.path, ns=(asset.mtime + 10 ** 9, asset.mtime + 10 ** 9))
+        asset = cache.get(self.path)
+        self.assertEqual((10, 20), (asset.width, asset.height))
+        self.assertEqual(2, cache.misses)
+
+    def test_draw_into_more_documents(self):
+        asset = ImageCache().get(self.path)
+        for i in range(2):
+            output = io.BytesIO()
+            canvas = Canvas(output)
+            asset.draw(canvas, 10, 10, 40, 20)
+            asset.draw(canvas, 60, 10, 40, 20)
+            canvas.showPage()
+            canvas.save()
+
+            xobjects = PdfReader(output).pages[0]['/Resources']['/XObject']
+            self.assertEqual(1, len(xobjects))
+            image = list(xobjects.values())[0].get_object()
+            self.assertEqual(40, image['/Width'])
+            self.assertIn('/SMask', image)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from InvoiceGenerator import pohoda
+from InvoiceGenerator.api import Correction
+from InvoiceGenerator.batch import render_many
+from InvoiceGenerator.pdf import CorrectingInvoice, ProformaInvoice, SimpleInvoice
+
+from PyPDF2 import PdfReader
+
+from tests.helpers import build_invoice
+
+
+class CrashingInvoice(SimpleInvoice):
+    def gen(self, filename):
+        os._exit(1)
+
+
+class RenderManyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def _jobs(self):
+        correction = build_invoice('C2024/1', model=Correction)
+        correction.reason = 'Wrong price'
+        return [
+            build_invoice('F1'),
+            (build_invoice('P1'), ProformaInvoice),
+            (correction, CorrectingInvoice),
+            # plain invoice has no reason to correction
+            (build_invoice('C2'), CorrectingInvoice),
+        ]
+
+    def _check_results(self, results):
+        results = sorted(results)
+        self.assertEqual([0, 1, 2, 3], [result.index for result in results])
+        self.assertEqual([True, True, True, False], [result.ok for result in results])
+        self.assertIn('AttributeError', results[3].error)
+        self.assertEqual(os.path.join(self.out_dir, 'C2024-1.pdf'), results[2].filename)
+        for result in results[:3]:
+            self.assertEqual(1, len(PdfReader(result.filename).pages))
+
+    def test_render_in_pool(self):
+        self._check_results(render_many(self._jobs(), self.out_dir, workers=2))
+
+    def test_render_in_process(self):
+        self._check_results(render_many(self._jobs(), self.out_dir, workers=0))
+
+    def test_gen_kwargs(self):
+        results = list(render_many([build_invoice('F1')], self.out_dir, workers=1, generate_qr_code=True))
+        self.assertTrue(results[0].ok, results[0].error)
+
+    def test_crashed_worker(self):
+        jobs = [(build_invoice('X1'), CrashingInvoice)] + [build_invoice('F%d' % i) for i in range(8)]
+        results = sorted(render_many(jobs, self.out_dir, workers=1))
+        self.assertEqual(list(range(9)), [result.index for result in results])
+        self.assertIn('BrokenProcessPool', results[0].error)
+        self.assertEqual([True] * 8, [result.ok for result in results[1:]])
+
+    def test_same_filename(self):
+        jobs = [build_invoice('F/1'), build_invoice('F-1'), build_invoice('F-1'), build_invoice('F-1_2')]
+        results = sorted(render_many(jobs, self.out_dir, workers=0))
+        self.assertEqual(
+            ['F-1.pdf', 'F-1_2.pdf', 'F-1_3.pdf', 'F-1_2_2.pdf'],
+            [os.path.basename(result.filename) for result in results],
+        )
+
+    def test_extension_of_generator(self):
+        jobs = [build_invoice('F1'), (build_invoice('F2'), pohoda.SimpleInvoice)]
+        results = sorted(render_many(jobs, self.out_dir, workers=0))
+        self.assertEqual(['F1.pdf', 'F2.xml'], [os.path.basename(result.filename) for result in results])
+        self.assertTrue(results[1].ok, results[1].error)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from InvoiceGenerator import i18n
+
+from babel.numbers import format_currency
+
+
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self._lang = os.environ.get("INVOICE_LANG")
+
+    def tearDown(self):
+        if self._lang is None:
+            os.environ.pop("INVOICE_LANG", None)
+        else:
+            os.environ["INVOICE_LANG"] = self._lang
+
+    def test_catalog_is_loaded_once(self):
+        with mock.patch.dict(i18n._catalogs, clear=True):
+            with mock.patch.object(i18n.gettext_module, 'translation', wraps=i18n.gettext_module.translation) as translation:
+                catalog = i18n.get_catalog('cs')
+                self.assertIs(catalog, i18n.get_catalog('cs'))
+                i18n.get_catalog('pt_BR')
+            self.assertEqual(2, translation.call_count)
+
+    def test_gettext(self):
+        os.environ["INVOICE_LANG"] = "cs"
+        self.assertEqual(u'Odběratel', i18n.gettext(u'Customer'))
+        os.environ["INVOICE_LANG"] = "pt_BR"
+        self.assertEqual(u'Cliente', i18n.gettext(u'Customer'))
+
+    def test_unknown_language(self):
+        os.environ["INVOICE_LANG"] = "xx"
+        self.assertEqual(u'Customer', i18n.gettext(u'Customer'))
+
+    def test_override(self):
+        os.environ["INVOICE_LANG"] = "cs"
+        with i18n.override('pt_BR'):
+            self.assertEqual('pt_BR', i18n.get_language())
+            with i18n.override(None):
+                self.assertEqual(u'Cliente', i18n.gettext(u'Customer'))
+        self.assertEqual('cs', i18n.get_language())
+
+    def test_format_number(self):
+        self.assertEqual(u'1\xa0234,50', i18n.format_number(Decimal('1234.5'), 'cs_CZ.UTF-8', 2))
+        self.assertEqual(u'1,234', i18n.format_number(1234, 'en_US.UTF-8'))
+
+
+class MoneyFormatterTest(unittest.TestCase):
+
+    def test_same_as_babel(self):
+        amounts = [Decimal('0'), Decimal('-0'), Decimal('0.005'), Decimal('-1234567.891'), 1000, 12.5, Decimal('Infinity')]
+        for currency, locale in [('USD', 'en_US.UTF-8'), ('EUR', 'de_DE'), ('INR', 'en_IN'), ('JPY', 'ja_JP'), ('Kč', 'pt_BR')]:
+            formatter = i18n.MoneyFormatter(currency, locale)
+            self.assertTrue(formatter._fast)
+            for amount in amounts * 2:
+                self.assertEqual(format_currency(amount, currency, locale=locale), formatter.format(amount))
+
+    def test_czech(self):
+        formatter = i18n.money_formatter(u'Kč', 'cs_CZ.UTF-8')
+        self.assertIs(formatter, i18n.money_formatter(u'Kč', 'cs_CZ.UTF-8'))
+        self.assertEqual(u'1\xa0000,-\xa0Kč', formatter(1000))
+        self.assertEqual(u'-12,50\xa0Kč', formatter(Decimal('-12.5')))
+
+    def test_cache(self):
+        formatter = i18n.MoneyFormatter('USD', 'en_US.UTF-8')
+        formatter.cache_size = 2
+        with mock.patch.object(formatter, '_format', wraps=formatter._format) as format_:
+            for amount in [1, 1, Decimal(1), 2, 3, 1, 0, 0]:
+                formatter.format(amount)
+        self.assertEqual(6, format_.call_count)
+        self.assertEqual({3, 1}, set(formatter._cache))
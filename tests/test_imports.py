@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import subprocess
+import sys
+import unittest
+
+
+def _imported_packages(module):
+    code = "import sys, %s; print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))" % module
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return set(output.decode().split())
+
+
+class LazyImportsTest(unittest.TestCase):
+    def test_api(self):
+        packages = _imported_packages('InvoiceGenerator.api')
+        for package in ('qrcode', 'qrplatba', 'PIL', 'babel', 'reportlab'):
+            self.assertNotIn(package, packages)
+
+    def test_pohoda(self):
+        packages = _imported_packages('InvoiceGenerator.pohoda')
+        for package in ('qrcode', 'PIL', 'babel', 'reportlab', 'lxml', 'asyncio'):
+            self.assertNotIn(package, packages)
+
+    def test_pdf(self):
+        packages = _imported_packages('InvoiceGenerator.pdf')
+        self.assertIn('reportlab', packages)
+        for package in ('qrcode', 'babel', 'asyncio'):
+            self.assertNotIn(package, packages)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import unittest
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+
+from InvoiceGenerator import instrumentation, pohoda
+from InvoiceGenerator.api import Item, Provider, qr_cache_clear
+from InvoiceGenerator.instrumentation import Metric, OpenTelemetryAdapter, StatsdAdapter
+from InvoiceGenerator.pdf import SimpleInvoice
+
+from PIL import Image
+
+from tests.helpers import build_invoice
+
+
+def _invoice(items=3):
+    return build_invoice('F0001', [Item(1, 10, description='Item %d' % (i % 2), tax=21) for i in range(items)])
+
+
+class FakeStatsd(object):
+    def __init__(self):
+        self.calls = []
+
+    def timing(self, name, milliseconds):
+        self.calls.append(('timing', name, milliseconds))
+
+    def incr(self, name, count=1):
+        self.calls.append(('incr', name, count))
+
+
+class FakeInstrument(object):
+    def __init__(self, kind, name, unit):
+        self.kind = kind
+        self.name = name
+        self.unit = unit
+        self.values = []
+
+    def record(self, value, attributes=None):
+        self.values.append((value, attributes))
+
+    add = record
+
+
+class FakeMeter(object):
+    def __init__(self):
+        self.instruments = {}
+
+    def create_histogram(self, name, unit=''):
+        return self.instruments.setdefault(name, FakeInstrument('histogram', name, unit))
+
+    def create_counter(self, name, unit=''):
+        return self.instruments.setdefault(name, FakeInstrument('counter', name, unit))
+
+
+class InstrumentationTest(unittest.TestCase):
+    def test_disabled(self):
+        self.assertFalse(instrumentation.enabled())
+        self.assertIs(instrumentation.phase('pdf.gen'), instrumentation.phase('pohoda.gen'))
+        SimpleInvoice(_invoice()).gen(io.BytesIO())
+
+    def test_pdf(self):
+        metrics = []
+        with instrumentation.subscribed(metrics.append):
+            self.assertTrue(instrumentation.enabled())
+            output = io.BytesIO()
+            SimpleInvoice(_invoice(100)).gen(output, generate_qr_code=True)
+        self.assertFalse(instrumentation.enabled())
+
+        durations = {metric.name for metric in metrics if metric.unit == 's'}
+        self.assertTrue({'pdf.gen', 'pdf.prepare', 'pdf.draw_items', 'pdf.draw_qr', 'pdf.save'}.issubset(durations))
+        counters = {metric.name: metric for metric in metrics if metric.unit != 's'}
+        self.assertEqual(counters['pdf.items'], Metric('pdf.items', 100, '1', {'generator': 'SimpleInvoice'}))
+        self.assertEqual(counters['pdf.pages'].value, 3)
+        self.assertEqual(counters['pdf.paragraph_cache.misses'].value, 2)
+        self.assertEqual(counters['pdf.bytes'], Metric('pdf.bytes', len(output.getvalue()), 'By', {'generator': 'SimpleInvoice'}))
+
+    def test_qr_code_vector(self):
+        metrics = []
+        pdf = SimpleInvoice(_invoice())
+        pdf.qr_code_vector = True
+        with instrumentation.subscribed(metrics.append):
+            pdf.gen(io.BytesIO(), generate_qr_code=True)
+        self.assertIn('pdf.draw_qr', [metric.name for metric in metrics])
+
+    def test_cache_counters(self):
+        qr_cache_clear()
+        with NamedTemporaryFile(suffix='.png') as logo:
+            Image.new('RGB', (60, 30), (0, 0, 255)).save(logo, format='PNG')
+            logo.flush()
+            provider = Provider('Pupik', bank_account='2600420569', bank_code='2010', logo_filename=logo.name)
+            names = []
+            for i in range(2):
+                metrics = []
+                with instrumentation.subscribed(metrics.append):
+                    SimpleInvoice(build_invoice(provider=provider)).gen(io.BytesIO(), generate_qr_code=True)
+                names.append([metric.name for metric in metrics])
+            self.assertIn('qr_cache.misses', names[0])
+            self.assertIn('image_cache.misses', names[0])
+            names = names[1]
+            self.assertIn('qr_cache.hits', names)
+            self.assertIn('image_cache.hits', names)
+            self.assertIn('font_subset_cache.hits', names)
+
+    def test_counting_writer(self):
+        with NamedTemporaryFile() as output:
+            writer = instrumentation.CountingWriter.wrap(output)
+            writer.write(b'PDF')
+            writer.flush()
+            self.assertEqual((3, output.name), (writer.count, writer.name))
+            self.assertEqual(3, os.path.getsize(output.name))
+
+    def test_pohoda(self):
+        metrics = []
+        with TemporaryDirectory() as directory, instrumentation.subscribed(metrics.append):
+            path = os.path.join(directory, 'invoice.xml')
+            pohoda.SimpleInvoice(_invoice()).gen(path)
+            size = os.path.getsize(path)
+            with pohoda.DataPackWriter(io.BytesIO(), id='batch-1') as writer:
+                writer.write(_invoice())
+                writer.write(_invoice())
+        names = [metric.name for metric in metrics]
+        self.assertEqual(names.count('pohoda.gen'), 1)
+        self.assertEqual(names.count('pohoda.data_pack.write'), 2)
+        self.assertIn(Metric('pohoda.bytes', size, 'By', {}), metrics)
+        self.assertIn(Metric('pohoda.bytes', writer.bytes_written, 'By', {}), metrics)
+        self.assertIn(Metric('pohoda.data_pack.invoices', 2, '1', {}), metrics)
+
+    def test_failing_callback(self):
+        def callback(metric):
+            raise RuntimeError()
+
+        with instrumentation.subscribed(callback), self.assertLogs('InvoiceGenerator.instrumentation', 'ERROR'):
+            pohoda.SimpleInvoice(_invoice()).gen(io.BytesIO())
+
+    def test_statsd(self):
+        client = FakeStatsd()
+        adapter = StatsdAdapter(client)
+        adapter(Metric('pdf.save', 0.25, 's', {}))
+        adapter(Metric('pdf.pages', 2, '1', {'generator': 'SimpleInvoice'}))
+        self.assertEqual(client.calls, [
+            ('timing', 'invoice_generator.pdf.save', 250),
+            ('incr', 'invoice_generator.pdf.pages', 2),
+        ])
+
+    def test_open_telemetry(self):
+        meter = FakeMeter()
+        adapter = OpenTelemetryAdapter(meter)
+        with instrumentation.subscribed(adapter):
+            SimpleInvoice(_invoice()).gen(io.BytesIO())
+            SimpleInvoice(_invoice()).gen(io.BytesIO())
+        save = meter.instruments['invoice_generator.pdf.save']
+        self.assertEqual((save.kind, save.unit, len(save.values)), ('histogram', 's', 2))
+        self.assertEqual(save.values[0][1], {'generator': 'SimpleInvoice'})
+        size = meter.instruments['invoice_generator.pdf.bytes']
+        self.assertEqual((size.kind, size.unit, len(size.values)), ('counter', 'By', 2))
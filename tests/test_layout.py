@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import io
+import unittest
+
+from InvoiceGenerator.api import Item
+from InvoiceGenerator.assets import font_registry
+from InvoiceGenerator.layout import ItemRow, PageBreak, ParagraphCache, layout_items
+from InvoiceGenerator.styles import default_style_sheet
+
+from reportlab.lib.units import mm
+from reportlab.pdfgen.canvas import Canvas
+
+
+class LayoutTest(unittest.TestCase):
+
+    def setUp(self):
+        font_registry.ensure(*default_style_sheet.fonts)
+        self.paragraphs = ParagraphCache(Canvas(io.BytesIO()))
+
+    def _layout(self, items):
+        return layout_items(items, self.paragraphs, default_style_sheet.item, 70 * mm, 180, 14, 260, 14)
+
+    def test_paragraph_cache(self):
+        paragraph, height = self.paragraphs.get(u'API calls', default_style_sheet.item, 70 * mm)
+        self.assertIs(paragraph, self.paragraphs.get(u'API calls', default_style_sheet.item, 70 * mm)[0])
+        self.assertNotEqual(paragraph, self.paragraphs.get(u'API calls', default_style_sheet.item, 90 * mm)[0])
+        self.assertEqual((1, 2), (self.paragraphs.hits, self.paragraphs.misses))
+        self.assertGreater(height, 0)
+
+    def test_distinct_descriptions_are_measured_once(self):
+        items = [Item(1, 1, description=u'API calls' if i % 2 else u'Storage GB-month ' * 20) for i in range(1000)]
+        layout = self._layout(items)
+        self.assertEqual(2, self.paragraphs.misses)
+
+        rows = [entry for entry in layout.entries if isinstance(entry, ItemRow)]
+        self.assertEqual(items, [row.item for row in rows])
+        self.assertGreater(rows[0].height, rows[1].height)
+        self.assertEqual({rows[0].height, rows[1].height}, {row.height for row in rows})
+
+    def test_page_breaks(self):
+        layout = self._layout([Item(1, 1, description=u'API calls')] * 200)
+        breaks = [index for index, entry in enumerate(layout.entries) if isinstance(entry, PageBreak)]
+        self.assertEqual(4, len(breaks))
+        first_row_on_page = layout.entries[breaks[0] + 1]
+        self.assertEqual((260, 14), (first_row_on_page.top, first_row_on_page.offset))
+        self.assertEqual(260, layout.top)
+        self.assertEqual(200, len(layout.entries) - len(breaks))
+
+    def test_no_items(self):
+        self.assertEqual(([], 180, 14, False), self._layout([]))
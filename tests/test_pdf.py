@@ -1,14 +1,37 @@
 # -*- coding: utf-8 -*-
 import datetime
+import io
 import os
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import NamedTemporaryFile
+from unittest import mock
 
-from InvoiceGenerator.api import Client, Creator, Invoice, Item, Provider
-from InvoiceGenerator.pdf import CorrectingInvoice, ProformaInvoice, SimpleInvoice
+from InvoiceGenerator import conf
+from InvoiceGenerator.api import Client, Correction, Creator, Invoice, Item, Provider
+from InvoiceGenerator.assets import font_registry, font_subset_cache
+from InvoiceGenerator.pdf import (
+    CorrectingInvoice, MultiInvoiceWriter, NumberedCanvas, ProformaInvoice, SimpleInvoice, render_bytes, write_invoices,
+)
+
+from PIL import Image
 
 from PyPDF2 import PdfReader
 
+from tests.helpers import build_invoice
+
+
+def _images(page):
+    """ Images drawn on the page, directly or by forms (the static layer of the invoice). """
+    images = []
+    for xobject in page.get('/Resources', {}).get('/XObject', {}).values():
+        xobject = xobject.get_object()
+        if xobject['/Subtype'] == '/Image':
+            images.append(xobject)
+        else:
+            images.extend(_images(xobject))
+    return images
+
 
 class TestBaseInvoice(unittest.TestCase):
     def test_required_args(self):
@@ -162,3 +185,233 @@ class TestBaseInvoice(unittest.TestCase):
         self.assertTrue(u"$3,000.00" in pdf_string)
         self.assertTrue(u"Total with tax: $30,150.00" in pdf_string)
         self.assertTrue(u"Creator: blah" in pdf_string)
+
+    def test_language_per_invoice(self):
+        expected = {
+            'cs': (u'Celkem s DPH', u'2,50 h'),
+            'pt_BR': (u'Total com imposto', u'2,50 h'),
+            'en': (u'Total with tax', u'2.50 h'),
+        }
+
+        def generate(language):
+            invoice = Invoice(Client('Kkkk'), Provider('Pupik'), Creator('blah'))
+            invoice.use_tax = True
+            invoice.language = language
+            invoice.currency_locale = 'en_US.UTF-8' if language == 'en' else 'cs_CZ.UTF-8'
+            for i in range(5):
+                invoice.add_item(Item('2.5', 600, unit='h', tax=21))
+            tmp_file = NamedTemporaryFile(delete=False)
+            SimpleInvoice(invoice).gen(tmp_file.name)
+            return language, PdfReader(tmp_file).pages[0].extract_text()
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            for language, pdf_string in executor.map(generate, list(expected) * 3):
+                for text in expected[language]:
+                    self.assertIn(text, pdf_string)
+
+    def test_qr_code(self):
+        invoice = Invoice(Client('Kkkk'), Provider('Pupik', bank_account='2600420569', bank_code='2010'), Creator('blah'))
+        invoice.add_item(Item(32, 600))
+
+        tmp_file = NamedTemporaryFile(delete=False)
+        SimpleInvoice(invoice).gen(tmp_file.name, generate_qr_code=True)
+        self.assertEqual(1, len(_images(PdfReader(tmp_file).pages[0])))
+
+        pdf = SimpleInvoice(invoice)
+        pdf.qr_code_vector = True
+        tmp_file = NamedTemporaryFile(delete=False)
+        pdf.gen(tmp_file.name, generate_qr_code=True)
+        page = PdfReader(tmp_file).pages[0]
+        self.assertEqual([], _images(page))
+        self.assertIn(b' re', page.get_contents().get_data())
+
+    def test_compression_level(self):
+        invoice = Invoice(Client(u'Klient ěščř'), Provider('Pupik'), Creator('blah'))
+        invoice.add_item(Item(32, 600, description=u'Položka'))
+
+        sizes = {}
+        for level in (None, 0, 1, 9):
+            pdf = SimpleInvoice(invoice)
+            pdf.compression_level = level
+            output = io.BytesIO()
+            # reportlab defaults
+            with mock.patch.object(conf, 'PDF_COMPRESSION_LEVEL', None):
+                pdf.gen(output)
+            self.assertIn(u'Položka', PdfReader(output).pages[0].extract_text())
+            sizes[level] = len(output.getvalue())
+        self.assertGreater(sizes[0], sizes[1])
+        self.assertGreaterEqual(sizes[1], sizes[9])
+        self.assertGreater(sizes[None], sizes[9])
+
+    def test_presubset_fonts(self):
+        font_subset_cache.clear()
+        misses = font_subset_cache.misses
+        for description in (u'Žluťoučký kůň', u'úpěl ďábelské ódy'):
+            invoice = Invoice(Client('Kkkk'), Provider('Pupik'), Creator('blah'))
+            invoice.language = 'cs'
+            invoice.add_item(Item(32, 600, description=description))
+            pdf = SimpleInvoice(invoice)
+            pdf.presubset_fonts = True
+            output = io.BytesIO()
+            pdf.gen(output)
+            self.assertIn(description, PdfReader(output).pages[0].extract_text())
+        # regular and bold face
+        self.assertEqual(2, font_subset_cache.misses - misses)
+
+    def test_logo_and_stamp(self):
+        logo = NamedTemporaryFile(suffix='.png', delete=False)
+        Image.new('RGBA', (60, 30), (0, 0, 255, 100)).save(logo, format='PNG')
+        logo.close()
+        invoice = Invoice(Client('Kkkk'), Provider('Pupik', logo_filename=logo.name), Creator('blah', stamp_filename=logo.name))
+        invoice.add_item(Item(32, 600))
+
+        for i in range(2):
+            tmp_file = NamedTemporaryFile(delete=False)
+            SimpleInvoice(invoice).gen(tmp_file.name)
+            self.assertEqual(1, len(_images(PdfReader(tmp_file).pages[0])))
+        os.unlink(logo.name)
+
+
+class NumberedCanvasTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"INVOICE_LANG": "en"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _generate(self, pages):
+        font_registry.ensure('DejaVu')
+        output = io.BytesIO()
+        canvas = NumberedCanvas(output)
+        for page in range(pages):
+            canvas.drawString(100, 100, 'Content %d' % page)
+            canvas.showPage()
+            # only the first page may be held back
+            self.assertLessEqual(sum(1 for value in vars(canvas).values() if isinstance(value, dict) and '_code' in value), 1)
+        canvas.save()
+        return PdfReader(output)
+
+    def test_page_numbers(self):
+        pdf = self._generate(3)
+        self.assertEqual(3, len(pdf.pages))
+        for number, page in enumerate(pdf.pages, 1):
+            text = page.extract_text()
+            self.assertIn('Content %d' % (number - 1), text)
+            self.assertIn('Page %d of 3' % number, text)
+
+    def test_single_page(self):
+        pdf = self._generate(1)
+        self.assertEqual(1, len(pdf.pages))
+        self.assertNotIn('/XObject', pdf.pages[0]['/Resources'])
+
+    def test_sections(self):
+        font_registry.ensure('DejaVu')
+        output = io.BytesIO()
+        canvas = NumberedCanvas(output)
+        for section, pages in enumerate((2, 1, 3)):
+            for page in range(pages):
+                canvas.drawString(100, 100, 'Section %d' % section)
+                canvas.showPage()
+            self.assertEqual(pages, canvas.endSection())
+        canvas.save()
+
+        texts = [page.extract_text() for page in PdfReader(output).pages]
+        self.assertEqual(6, len(texts))
+        expected = ['Page 1 of 2', 'Page 2 of 2', None, 'Page 1 of 3', 'Page 2 of 3', 'Page 3 of 3']
+        for text, page_number in zip(texts, expected):
+            if page_number is None:
+                self.assertNotIn('Page', text)
+            else:
+                self.assertIn(page_number, text)
+
+
+class RenderBytesTest(unittest.TestCase):
+
+    def test_render_bytes(self):
+        data = render_bytes(build_invoice(), generate_qr_code=True)
+        self.assertTrue(data.startswith(b'%PDF-'))
+        self.assertIn('Item F1', PdfReader(io.BytesIO(data)).pages[0].extract_text())
+
+        data = render_bytes(build_invoice(), ProformaInvoice)
+        self.assertIn('F1', PdfReader(io.BytesIO(data)).pages[0].extract_text())
+
+    def test_write_only_stream(self):
+        class Response(object):
+            def __init__(self):
+                self.chunks = []
+
+            def write(self, data):
+                self.chunks.append(data)
+
+        response = Response()
+        SimpleInvoice(build_invoice()).gen(response)
+        self.assertIn('Item F1', PdfReader(io.BytesIO(b''.join(response.chunks))).pages[0].extract_text())
+
+
+class MultiInvoiceWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"INVOICE_LANG": "en"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.logo = NamedTemporaryFile(suffix='.png', delete=False)
+        Image.new('RGB', (60, 30), (0, 0, 255)).save(self.logo, format='PNG')
+        self.logo.close()
+
+    def tearDown(self):
+        os.unlink(self.logo.name)
+
+    def _invoice(self, number, items=1, provider='Pupik'):
+        provider = Provider(provider, bank_account='2600420569', bank_code='2010', logo_filename=self.logo.name)
+        return build_invoice(number, [Item(1, 10, description='Item %d' % i) for i in range(items)], provider=provider)
+
+    def test_write_invoices(self):
+        output = io.BytesIO()
+        invoices = [self._invoice('F1'), self._invoice('F2', items=80), self._invoice('F3', provider='Other')]
+        self.assertEqual(3, write_invoices(invoices, output, generate_qr_code=True))
+
+        pdf = PdfReader(output)
+        texts = [page.extract_text() for page in pdf.pages]
+        self.assertEqual(5, len(texts))
+        for text, number in zip(texts, ['F1', 'F2', None, None, 'F3']):
+            if number is not None:
+                self.assertIn(number, text)
+        self.assertNotIn('Page', texts[0])
+        self.assertIn('Page 1 of 3', texts[1])
+        self.assertIn('Page 3 of 3', texts[3])
+        self.assertNotIn('Page', texts[4])
+        self.assertIn('Other', texts[4])
+
+        # regular and bold face, the logo of both providers is embedded once
+        self.assertEqual(2, output.getvalue().count(b'/FontFile2'))
+        logos = {image.indirect_reference.idnum for page in pdf.pages for image in _images(page) if image['/Width'] == 60}
+        self.assertEqual(1, len(logos))
+
+    def test_generator_per_invoice(self):
+        correction = Correction(Client('Kkkk'), Provider('Pupik'), Creator('blah'))
+        correction.number = 'C1'
+        correction.reason = 'Wrong price'
+        correction.add_item(Item(1, -10))
+
+        tmp_file = NamedTemporaryFile(delete=False)
+        tmp_file.close()
+        with MultiInvoiceWriter(tmp_file.name, title='Print run') as writer:
+            writer.write(self._invoice('F1'), generate_qr_code=True)
+            writer.write(correction, CorrectingInvoice)
+            writer.write(self._invoice('F2'), ProformaInvoice)
+        self.assertEqual(3, writer.count)
+        self.assertRaises(ValueError, writer.write, self._invoice('F3'))
+
+        pdf = PdfReader(tmp_file.name)
+        self.assertEqual('Print run', pdf.metadata.title)
+        self.assertEqual(3, len(pdf.pages))
+        self.assertIn('Wrong price', pdf.pages[1].extract_text())
+        os.unlink(tmp_file.name)
+
+    def test_nothing_written_on_error(self):
+        output = io.BytesIO()
+        with self.assertRaises(KeyError):
+            with MultiInvoiceWriter(output) as writer:
+                writer.write(self._invoice('F1'))
+                raise KeyError('invoice')
+        self.assertEqual(b'', output.getvalue())
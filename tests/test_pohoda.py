@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 import datetime
+import io
+import os
+import shutil
 import unittest
-from tempfile import NamedTemporaryFile
+from decimal import Decimal
+from tempfile import NamedTemporaryFile, mkdtemp
 
+from InvoiceGenerator import conf
 from InvoiceGenerator.api import Client, Creator, Invoice, Item, Provider
-from InvoiceGenerator.pohoda import SimpleInvoice
+from InvoiceGenerator.pohoda import DataPackWriter, SimpleInvoice, ValidationError, load_schema, validate, write_data_pack
 
 import xmlunittest
 
@@ -93,3 +98,204 @@ class TestBaseInvoice(unittest.TestCase, xmlunittest.XmlTestMixin):
             './dataPack/dataPackItem/invoice/invoiceSummary/priceHighVAT/text/text()',
             '43.4910',
         )
+
+
+class DataPackWriterTest(unittest.TestCase, xmlunittest.XmlTestMixin):
+    def _invoice(self, number):
+        provider = Provider('Pupik', ir='785684523', bank_account='2600420569', bank_code='2010')
+        client = Client('Kkkk & <syn>', address='Kubelikova "1"\n', city='Frantisek')
+        invoice = Invoice(client, provider, Creator('blah'))
+        invoice.number = number
+        invoice.title = u"Testovací faktura"
+        invoice.date = datetime.date(2024, 7, 14)
+        invoice.add_item(Item(32, '600.6', description=u"Krátký popis", tax=15))
+        invoice.add_item(Item(2, '2.5', description=u"Popis", tax=21))
+        return invoice
+
+    def test_same_as_gen(self):
+        invoice = self._invoice('F20140001')
+        expected = io.BytesIO()
+        SimpleInvoice(invoice).gen(expected)
+
+        stream = io.BytesIO()
+        with DataPackWriter(stream, id='F20140001', ico='785684523') as writer:
+            writer.write(invoice)
+        self.assertEqual(stream.getvalue(), expected.getvalue())
+        self.assertEqual(writer.count, 1)
+
+    def test_write_data_pack(self):
+        with NamedTemporaryFile(suffix='.xml') as tmp_file:
+            count = write_data_pack(
+                (self._invoice('F%04d' % i) for i in range(1, 101)),
+                tmp_file.name, id='batch-1', ico='785684523',
+            )
+            xml_string = tmp_file.read()
+
+        self.assertEqual(count, 100)
+        root = self.assertXmlDocument(xml_string)
+        self.assertEqual(root.get('id'), 'batch-1')
+        self.assertXpathValues(
+            root,
+            './dataPackItem/invoice/invoiceHeader/number/numberRequested/text()',
+            ['F%04d' % i for i in range(1, 101)],
+        )
+        self.assertXpathValues(
+            root,
+            './dataPackItem/invoice/invoiceHeader/partnerIdentity/address/company/text()',
+            ['Kkkk & <syn>'] * 100,
+        )
+
+    def test_error(self):
+        stream = io.BytesIO()
+        with self.assertRaises(RuntimeError):
+            with DataPackWriter(stream, id='batch-1') as writer:
+                writer.write(self._invoice('F0001'))
+                raise RuntimeError()
+        self.assertNotIn(b'</dat:dataPack>', stream.getvalue())
+        with self.assertRaises(ValueError):
+            writer.write(self._invoice('F0002'))
+
+
+class TaxRatesTest(unittest.TestCase):
+    def _invoice(self, *taxes):
+        invoice = Invoice(Client('Kkkk'), Provider('Pupik', ir='12345678'), Creator('blah'))
+        invoice.number = 'F0001'
+        for tax in taxes:
+            invoice.add_item(Item(1, 10, tax=tax))
+        return invoice
+
+    def test_normalized(self):
+        generator = SimpleInvoice(self._invoice(), tax_rates={'high': '21.0', 'low': 10.5, 'none': 0})
+        self.assertEqual(generator.inv_tax_rates[Decimal('21.00')], 'high')
+        self.assertEqual(generator.inv_tax_rates[Decimal('10.50')], 'low')
+        self.assertIs(SimpleInvoice(self._invoice()).inv_tax_rates, SimpleInvoice(self._invoice()).inv_tax_rates)
+
+        stream = io.BytesIO()
+        SimpleInvoice(self._invoice('21.00', 10.5), tax_rates={'high': '21', 'low': 10.5}).gen(stream)
+        self.assertIn(b'<inv:rateVAT>high</inv:rateVAT>', stream.getvalue())
+        self.assertIn(b'<inv:rateVAT>low</inv:rateVAT>', stream.getvalue())
+        self.assertIn(b'<typ:priceHigh>12.10</typ:priceHigh>', stream.getvalue())
+
+    def test_unknown_rates(self):
+        generator = SimpleInvoice(self._invoice(21, 7, 7, 19))
+        with self.assertLogs('InvoiceGenerator.pohoda', 'WARNING') as logs:
+            generator.gen(io.BytesIO())
+        self.assertEqual(generator.unknown_tax_rates, {7: 2, 19: 1})
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("7: 2, 19: 1", logs.output[0])
+
+    def test_unknown_rates_data_pack(self):
+        with self.assertLogs('InvoiceGenerator.pohoda', 'WARNING') as logs:
+            with DataPackWriter(io.BytesIO(), id='batch-1') as writer:
+                for i in range(10):
+                    writer.write(self._invoice(21, 7))
+        self.assertEqual(writer.unknown_tax_rates, {7: 10})
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("7: 10", logs.output[0])
+
+
+# simplified schema with the same structure as the Pohoda schemas
+DATA_XSD = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"
+           targetNamespace="http://www.stormware.cz/schema/version_2/data.xsd" elementFormDefault="qualified">
+  <xs:import namespace="http://www.stormware.cz/schema/version_2/invoice.xsd" schemaLocation="invoice.xsd"/>
+  <xs:element name="dataPack">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:element name="dataPackItem" minOccurs="0" maxOccurs="unbounded">
+          <xs:complexType>
+            <xs:sequence>
+              <xs:any namespace="http://www.stormware.cz/schema/version_2/invoice.xsd" processContents="strict"/>
+            </xs:sequence>
+            <xs:attribute name="id" type="xs:string" use="required"/>
+            <xs:attribute name="version" type="xs:string" use="required"/>
+          </xs:complexType>
+        </xs:element>
+      </xs:sequence>
+      <xs:attribute name="id" type="xs:string" use="required"/>
+      <xs:attribute name="ico">
+        <xs:simpleType><xs:restriction base="xs:string"><xs:pattern value="[0-9]{8}"/></xs:restriction></xs:simpleType>
+      </xs:attribute>
+      <xs:anyAttribute processContents="skip"/>
+    </xs:complexType>
+  </xs:element>
+</xs:schema>
+"""
+
+INVOICE_XSD = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"
+           targetNamespace="http://www.stormware.cz/schema/version_2/invoice.xsd" elementFormDefault="qualified">
+  <xs:element name="invoice">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:element name="invoiceHeader"><xs:complexType><xs:sequence>
+          <xs:any processContents="skip" minOccurs="0" maxOccurs="unbounded"/>
+        </xs:sequence></xs:complexType></xs:element>
+        <xs:element name="invoiceDetail"><xs:complexType><xs:sequence>
+          <xs:element name="invoiceItem" minOccurs="0" maxOccurs="unbounded"><xs:complexType><xs:sequence>
+            <xs:any processContents="skip" minOccurs="0" maxOccurs="unbounded"/>
+          </xs:sequence></xs:complexType></xs:element>
+        </xs:sequence></xs:complexType></xs:element>
+        <xs:element name="invoiceSummary"><xs:complexType><xs:sequence>
+          <xs:any processContents="skip" minOccurs="0" maxOccurs="unbounded"/>
+        </xs:sequence></xs:complexType></xs:element>
+      </xs:sequence>
+      <xs:attribute name="version" type="xs:string"/>
+    </xs:complexType>
+  </xs:element>
+</xs:schema>
+"""
+
+
+class ValidationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_dir = mkdtemp()
+        for name, content in (('data.xsd', DATA_XSD), ('invoice.xsd', INVOICE_XSD)):
+            with open(os.path.join(cls.schema_dir, name), 'w') as f:
+                f.write(content)
+        cls.schema = os.path.join(cls.schema_dir, 'data.xsd')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.schema_dir)
+
+    def setUp(self):
+        self.original_schema = conf.POHODA_SCHEMA
+        conf.POHODA_SCHEMA = self.schema
+
+    def tearDown(self):
+        conf.POHODA_SCHEMA = self.original_schema
+
+    def _invoice(self, ir='12345678'):
+        invoice = Invoice(Client('Kkkk'), Provider('Pupik', ir=ir), Creator('blah'))
+        invoice.number = 'F0001'
+        invoice.add_item(Item(1, 2, tax=21))
+        return invoice
+
+    def test_load_schema(self):
+        schema = load_schema()
+        self.assertIs(load_schema(self.schema), schema)
+        conf.POHODA_SCHEMA = None
+        self.assertRaises(ValueError, load_schema)
+
+    def test_gen(self):
+        stream = io.BytesIO()
+        SimpleInvoice(self._invoice()).gen(stream, validate=True)
+        validate(stream.getvalue())
+
+        stream = io.BytesIO()
+        with self.assertRaises(ValidationError) as context:
+            SimpleInvoice(self._invoice(ir='123')).gen(stream, validate=True)
+        self.assertIn("'ico'", context.exception.errors[0])
+        self.assertEqual(stream.getvalue(), b'')
+
+    def test_data_pack(self):
+        stream = io.BytesIO()
+        with DataPackWriter(stream, id='batch-1', ico='12345678', validate=True) as writer:
+            writer.write(self._invoice())
+            writer.write(self._invoice(ir='123'))
+        validate(io.BytesIO(stream.getvalue()))
+
+        with self.assertRaises(ValidationError):
+            write_data_pack([self._invoice()], io.BytesIO(), id='batch-1', ico='123', validate=True)
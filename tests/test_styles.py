@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import copy
+import unittest
+from tempfile import NamedTemporaryFile
+
+from InvoiceGenerator.api import Client, Creator, Invoice, Item, Provider
+from InvoiceGenerator.pdf import SimpleInvoice
+from InvoiceGenerator.styles import FrozenParagraphStyle, InvoiceStyleSheet, default_style_sheet
+
+from PyPDF2 import PdfReader
+
+from reportlab.lib.styles import ParagraphStyle
+
+
+class FrozenParagraphStyleTest(unittest.TestCase):
+
+    def test_frozen(self):
+        style = FrozenParagraphStyle('foo', fontName='DejaVu', fontSize=7)
+        self.assertRaises(AttributeError, setattr, style, 'fontSize', 8)
+        self.assertRaises(AttributeError, delattr, style, 'fontSize')
+        self.assertRaises(AttributeError, style.refresh)
+        self.assertEqual(7, style.fontSize)
+
+    def test_parent(self):
+        parent = FrozenParagraphStyle('foo', fontName='DejaVu', fontSize=7)
+        style = FrozenParagraphStyle('bar', parent=parent, leading=9)
+        self.assertEqual(('DejaVu', 7, 9), (style.fontName, style.fontSize, style.leading))
+        self.assertRaises(AttributeError, setattr, style, 'fontSize', 8)
+
+    def test_clone(self):
+        style = FrozenParagraphStyle('foo', fontName='DejaVu', fontSize=7)
+        for clone in (style.clone('bar', fontSize=8), copy.copy(style), copy.deepcopy(style)):
+            self.assertIs(ParagraphStyle, type(clone))
+            clone.leading = 12
+            self.assertEqual('DejaVu', clone.fontName)
+        self.assertEqual(8, style.clone('bar', fontSize=8).fontSize)
+        self.assertEqual(7, style.fontSize)
+
+
+class InvoiceStyleSheetTest(unittest.TestCase):
+
+    def test_default(self):
+        self.assertEqual(('DejaVu', 'DejaVu-Bold'), default_style_sheet.fonts)
+        self.assertEqual(7, default_style_sheet.item.fontSize)
+        self.assertEqual(8.5, default_style_sheet.address.leading)
+        self.assertEqual(6, default_style_sheet.note.fontSize)
+
+    def test_overrides(self):
+        styles = InvoiceStyleSheet(item={'fontSize': 8, 'leading': 9.6})
+        self.assertEqual((8, 9.6), (styles.item.fontSize, styles.item.leading))
+        self.assertRaises(ValueError, InvoiceStyleSheet, items={'fontSize': 8})
+
+    def test_theme(self):
+        invoice = Invoice(Client('Kkkk'), Provider('Pupik'), Creator('blah'))
+        invoice.add_item(Item(32, 600, description=u'<b>Item</b>'))
+        pdf = SimpleInvoice(invoice)
+        pdf.styles = InvoiceStyleSheet('DejaVuSerif', 'DejaVuSerif-Bold')
+
+        tmp_file = NamedTemporaryFile(delete=False)
+        pdf.gen(tmp_file.name)
+        fonts = PdfReader(tmp_file).pages[0]['/Resources']['/Font']
+        base_fonts = sorted(str(font.get_object()['/BaseFont']).lstrip('/').split('+')[-1] for font in fonts.values())
+        # Helvetica is initial font of every reportlab canvas
+        self.assertEqual(['DejaVuSerif', 'DejaVuSerif-Bold', 'Helvetica'], base_fonts)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import io
+import unittest
+from unittest import mock
+
+from InvoiceGenerator import conf
+from InvoiceGenerator.api import Client, Correction, Invoice, Item, Provider
+from InvoiceGenerator.assets import font_registry
+from InvoiceGenerator.pdf import CorrectingInvoice, ProformaInvoice, SimpleInvoice
+from InvoiceGenerator.templates import StaticLayer, TemplateCache
+
+from PyPDF2 import PdfReader
+
+from reportlab import rl_config
+from reportlab.pdfgen.canvas import Canvas
+
+from tests.helpers import build_invoice
+
+
+def _invoice(items=1, provider=None, language='cs', model=Invoice):
+    provider = provider or Provider(u'Pupík s.r.o.', 'Street 1', 'Praha', '11000', note=u'Zapsán v OR')
+    items = [Item(i + 1, 600, description=u'Položka %d' % i) for i in range(items)]
+    return build_invoice('F1', items, model, Client(u'Klient ěščř'), provider, language=language)
+
+
+class TemplateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        font_registry.ensure('DejaVu')
+        self.invariant = rl_config.invariant
+        rl_config.invariant = 1
+
+    def tearDown(self):
+        rl_config.invariant = self.invariant
+
+    def _gen(self, invoice, cache, generator=SimpleInvoice):
+        pdf = generator(invoice)
+        pdf.template_cache = cache
+        output = io.BytesIO()
+        pdf.gen(output)
+        return output.getvalue()
+
+    def test_replayed_layer_is_same(self):
+        for generator, model in ((SimpleInvoice, Invoice), (CorrectingInvoice, Correction)):
+            cache = TemplateCache()
+            drawn = self._gen(_invoice(60, model=model), cache, generator)
+            replayed = self._gen(_invoice(60, model=model), cache, generator)
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+            self.assertEqual(drawn, replayed)
+
+    def test_without_cache(self):
+        data = self._gen(_invoice(), None)
+        text = PdfReader(io.BytesIO(data)).pages[0].extract_text()
+        self.assertIn(u'Pupík s.r.o.', text)
+        self.assertIn(u'Položka 0', text)
+
+    def test_title_font_size(self):
+        for generator, model in ((SimpleInvoice, Invoice), (ProformaInvoice, Invoice), (CorrectingInvoice, Correction)):
+            cache = TemplateCache()
+            for template_cache in (None, cache, cache):
+                sizes = []
+
+                def visitor(text, cm, tm, font, size):
+                    if u': F1' in text:
+                        sizes.append(size)
+
+                PdfReader(io.BytesIO(self._gen(_invoice(model=model), template_cache, generator))).pages[0].extract_text(visitor_text=visitor)
+                # number of the invoice in the title comes first
+                self.assertEqual(15, sizes[0], (generator, template_cache))
+
+    def test_header_on_every_page(self):
+        reader = PdfReader(io.BytesIO(self._gen(_invoice(120), TemplateCache())))
+        self.assertGreater(len(reader.pages), 1)
+        for page in reader.pages:
+            self.assertIn('/FormXob.ItemsHeader', page['/Resources']['/XObject'])
+            self.assertIn(b'/FormXob.ItemsHeader Do', page.get_contents().get_data())
+
+    def test_key(self):
+        cache = TemplateCache()
+        self._gen(_invoice(), cache)
+        self._gen(_invoice(language='en'), cache)
+        self._gen(_invoice(provider=Provider('Other')), cache)
+        self.assertEqual((0, 3), (cache.hits, cache.misses))
+        self._gen(_invoice(language='en'), cache)
+        self.assertEqual(1, cache.hits)
+
+    def test_maxsize(self):
+        cache = TemplateCache(maxsize=1)
+        self._gen(_invoice(), cache)
+        self._gen(_invoice(provider=Provider('Other')), cache)
+        self._gen(_invoice(), cache)
+        self.assertEqual((0, 3), (cache.hits, cache.misses))
+
+    def test_maxsize_from_conf(self):
+        cache = TemplateCache()
+        with mock.patch.object(conf, 'TEMPLATE_CACHE_SIZE', 1):
+            self._gen(_invoice(), cache)
+            self._gen(_invoice(provider=Provider('Other')), cache)
+            self._gen(_invoice(), cache)
+        self.assertEqual((0, 3), (cache.hits, cache.misses))
+
+    def test_not_reusable_after_text(self):
+        canvas = Canvas(io.BytesIO())
+        canvas.setFont('DejaVu', 10)
+        canvas.drawString(10, 10, u'Žluťoučký')
+        layer = StaticLayer.record(canvas, [('Form', lambda: canvas.drawString(10, 10, u'kůň'))])
+        self.assertFalse(layer.reusable)
+        self.assertFalse(layer.replay(Canvas(io.BytesIO())))
+
+    def test_replay_only_into_new_document(self):
+        canvas = Canvas(io.BytesIO())
+        canvas.setFont('DejaVu', 10)
+        layer = StaticLayer.record(canvas, [('Form', lambda: canvas.drawString(10, 10, u'kůň'))])
+        self.assertTrue(layer.reusable)
+        self.assertFalse(layer.replay(canvas))
+
+        other = Canvas(io.BytesIO())
+        other.setFont('DejaVu', 10)
+        other.drawString(10, 10, u'Žluťoučký')
+        self.assertFalse(layer.replay(other))
+        self.assertTrue(layer.replay(Canvas(io.BytesIO())))
+
+    def test_not_reusable_with_unknown_reportlab_state(self):
+        canvas = Canvas(io.BytesIO())
+        canvas._doc.delayedFonts = ()
+        layer = StaticLayer.record(canvas, [('Form', lambda: canvas.rect(10, 10, 10, 10))])
+        self.assertFalse(layer.reusable)
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(SimpleInvoice.template_cache)